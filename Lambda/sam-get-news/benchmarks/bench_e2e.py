@@ -0,0 +1,183 @@
+# End-to-end benchmark of lambda_handler without AWS or news sites: a local
+# HTTP server serves a synthetic feed and its articles, and fake Bedrock and
+# S3 clients are injected in the function module
+#   python bench_e2e.py --entries 20 --article-size 50000 --model-latency 1
+
+import io
+import os
+import sys
+import time
+import argparse
+import contextlib
+import threading
+import tracemalloc
+import http.server
+from xml.sax.saxutils import escape
+
+GET_NEWS = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'get_news')
+sys.path.insert(0, GET_NEWS)
+
+from fake_bedrock import FakeBedrock
+from fake_s3 import FakeS3
+
+WORDS = 'the new service is now available in more regions with lower prices and better performance'.split()
+
+
+def make_article(index, size):
+    sentence = ' '.join(WORDS[(index + i) % len(WORDS)] for i in range(12)).capitalize() + '. '
+    paragraph = '<p>' + sentence * 8 + '</p>\n'
+    body = paragraph * (size // len(paragraph) + 1)
+    return (
+        f'<html><head><title>Article {index}</title><script>var tracking = {index};</script></head>'
+        f'<body><nav>Home | News | About</nav><h1>Article {index}</h1>{body}'
+        '<footer>Copyright</footer></body></html>'
+    ).encode()
+
+
+def make_feed(base_url, entries, atom=False):
+    links = [escape(f'{base_url}/article/{i}') for i in range(entries)]
+    if atom:
+        items = ''.join(
+            f'<entry><title>Article {i}</title><link href="{link}"/><id>{link}</id></entry>'
+            for i, link in enumerate(links)
+        )
+        return (
+            '<?xml version="1.0" encoding="UTF-8"?><feed xmlns="http://www.w3.org/2005/Atom">'
+            f'<title>Benchmark News</title>{items}</feed>'
+        ).encode()
+    items = ''.join(
+        f'<item><title>Article {i}</title><link>{link}</link><guid>{link}</guid></item>'
+        for i, link in enumerate(links)
+    )
+    return (
+        '<?xml version="1.0" encoding="UTF-8"?><rss version="2.0"><channel>'
+        f'<title>Benchmark News</title><link>{escape(base_url)}</link>{items}</channel></rss>'
+    ).encode()
+
+
+def start_server(entries, article_size, latency, atom):
+    pages = {}
+
+    class Handler(http.server.BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+        disable_nagle_algorithm = True
+
+        def do_GET(self):
+            body = pages.get(self.path)
+            if body is None:
+                self.send_error(404)
+                return
+            time.sleep(latency)
+            self.send_response(200)
+            if self.path == '/feed':
+                content_type = 'application/atom+xml' if atom else 'application/rss+xml'
+            else:
+                content_type = 'text/html; charset=utf-8'
+            self.send_header('Content-Type', content_type)
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = http.server.ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    base_url = f'http://127.0.0.1:{server.server_port}'
+    pages['/feed'] = make_feed(base_url, entries, atom)
+    for i in range(entries):
+        pages[f'/article/{i}'] = make_article(i, article_size)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, base_url + '/feed'
+
+
+# Wrap a function of the app module to record how long each call takes
+def timed(module, name, timings):
+    function = getattr(module, name)
+    timings[name] = []
+
+    def wrapper(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return function(*args, **kwargs)
+        finally:
+            timings[name].append(time.perf_counter() - start)
+
+    setattr(module, name, wrapper)
+
+
+def percentile(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(p / 100 * (len(values) - 1))))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='End-to-end benchmark of the function')
+    parser.add_argument('--entries', type=int, default=10)
+    parser.add_argument('--article-size', type=int, default=50_000, help='bytes of HTML per article')
+    parser.add_argument('--site-latency', type=float, default=0.1, help='seconds for each page')
+    parser.add_argument('--model-latency', type=float, default=0.5, help='seconds for each invocation')
+    parser.add_argument('--throttle-rate', type=float, default=0.0, help='probability of a throttle')
+    parser.add_argument('--miss-rate', type=float, default=0.0,
+                        help='probability of an article missing from a batch response')
+    parser.add_argument('--atom', action='store_true', help='serve an Atom feed instead of RSS')
+    parser.add_argument('--trailing-chars', type=int, default=0,
+                        help='characters the fake model generates after the summary')
+    parser.add_argument('--runs', type=int, default=3)
+    parser.add_argument('--verbose', action='store_true', help='show the output of the function')
+    args = parser.parse_args()
+
+    server, feed_url = start_server(
+        args.entries, args.article_size, args.site_latency, args.atom
+    )
+
+    os.environ.update(
+        OUTPUT_BUCKET='benchmark', OUTPUT_FILE='news.json', RSS_LINK=feed_url,
+        MAX_ENTRIES=str(args.entries)
+    )
+    os.environ.setdefault('MODEL_RATE', '100')  # Measure the pipeline, not the ramp-up
+    os.environ.setdefault('MODEL_MAX_RATE', '100')
+    import app
+
+    timings = {}
+    for name in ['check_feed', 'get_text_from_url', 'invoke_text_model', 'create_s3_object']:
+        timed(app, name, timings)
+
+    walls = []
+    peaks = []
+    for run in range(args.runs):
+        s3 = FakeS3()
+        bedrock = FakeBedrock(
+            args.model_latency, throttle_rate=args.throttle_rate, miss_rate=args.miss_rate,
+            trailing='\n' + 'x' * args.trailing_chars if args.trailing_chars else ''
+        )
+        app.clients.update({'s3': s3, 'bedrock-runtime': bedrock})
+        app.summary_cache.items = None  # Every run starts without cached summaries
+
+        tracemalloc.start()
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(sys.stdout if args.verbose else io.StringIO()):
+            result = app.lambda_handler({'force': True}, None)
+        walls.append(time.perf_counter() - start)
+        peaks.append(tracemalloc.get_traced_memory()[1])
+        tracemalloc.stop()
+
+        if result['statusCode'] != 200:
+            sys.exit(f'Unexpected result: {result}')
+        print(f'run {run + 1}: {walls[-1]:.2f} s, {bedrock.calls} model calls, '
+              f'{bedrock.throttles} throttles, {s3.puts} S3 puts')
+
+    server.shutdown()
+
+    print(f'\n{args.entries} entries, {args.runs} runs')
+    print(f'wall time: p50 {percentile(walls, 50):.2f} s, max {max(walls):.2f} s')
+    print(f'peak memory: {max(peaks) / 1024 / 1024:.1f} MiB')
+    print(f'{"stage":>18} {"calls":>6} {"p50 ms":>9} {"p90 ms":>9} {"p99 ms":>9}')
+    for name, values in timings.items():
+        if values:
+            print(f'{name:>18} {len(values):6} ' + ' '.join(
+                f'{percentile(values, p) * 1000:9.1f}' for p in (50, 90, 99)
+            ))
+
+
+if __name__ == '__main__':
+    main()
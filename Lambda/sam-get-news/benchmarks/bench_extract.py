@@ -0,0 +1,75 @@
+# Compare the streaming text extractor with the previous BeautifulSoup implementation
+#
+# Save some news pages in a directory, for example:
+#   curl -s -o corpus/page1.html https://aws.amazon.com/about-aws/whats-new/...
+# Then run:
+#   python bench_extract.py corpus
+
+import io
+import os
+import sys
+import time
+import argparse
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'get_news'))
+
+from extract import extract_text
+from bs4 import BeautifulSoup
+
+
+# get_text_from_url before the streaming extractor, without the download
+def soup_text(html):
+    soup = BeautifulSoup(html, features="html.parser")
+    for script in soup(["script", "style"]):
+        script.extract()
+    text = soup.get_text()
+    lines = (line.strip() for line in text.splitlines())
+    chunks = (phrase.strip() for line in lines for phrase in line.split("  "))
+    return '\n'.join(chunk for chunk in chunks if chunk)
+
+
+def stream_text(html, max_chars):
+    return extract_text(io.BytesIO(html), max_chars=max_chars)
+
+
+def measure(function, pages, repeat):
+    tracemalloc.start()
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for html in pages:
+            function(html)
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed / (repeat * len(pages)), peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark HTML text extraction')
+    parser.add_argument('corpus', help='directory with saved HTML pages')
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--max-chars', type=int, default=100000)
+    args = parser.parse_args()
+
+    pages = []
+    for name in sorted(os.listdir(args.corpus)):
+        if name.endswith(('.html', '.htm')):
+            with open(os.path.join(args.corpus, name), 'rb') as f:
+                pages.append(f.read())
+    if not pages:
+        sys.exit(f'No .html files in {args.corpus}')
+
+    total = sum(len(p) for p in pages)
+    print(f'{len(pages)} pages, {total / 1024:.0f} KiB')
+
+    for name, function in [
+        ('beautifulsoup', soup_text),
+        ('streaming', lambda html: stream_text(html, args.max_chars)),
+    ]:
+        per_page, peak = measure(function, pages, args.repeat)
+        print(f'{name:>14}: {per_page * 1000:8.2f} ms/page, peak memory {peak / 1024:8.0f} KiB')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,84 @@
+# Compare urlopen with the pooled keep-alive HTTP client on a local server.
+# The server can add a delay to each new connection, to simulate the TCP and
+# TLS handshakes of a remote site.
+#   python bench_http.py --pages 50 --connect-latency 0.05
+
+import os
+import sys
+import gzip
+import time
+import argparse
+import threading
+import http.server
+from urllib.request import urlopen
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'get_news'))
+
+from http_client import HTTPClient
+
+
+def make_handler(page_size, connect_latency):
+    page = (b'<p>Some news about the cloud.</p>\n' * (page_size // 34 + 1))[:page_size]
+    compressed = gzip.compress(page)
+
+    class Handler(http.server.BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'  # Keep-alive
+        disable_nagle_algorithm = True  # Headers and body are written separately
+
+        def setup(self):
+            time.sleep(connect_latency)
+            super().setup()
+
+        def do_GET(self):
+            gzipped = 'gzip' in self.headers.get('Accept-Encoding', '')
+            body = compressed if gzipped else page
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/html; charset=utf-8')
+            self.send_header('Content-Length', str(len(body)))
+            if gzipped:
+                self.send_header('Content-Encoding', 'gzip')
+            self.end_headers()
+            self.wfile.write(body)
+            self.server.bytes_sent += len(body)
+
+        def log_message(self, *args):
+            pass
+
+    return Handler
+
+
+def run(name, fetch, urls, workers, server):
+    server.bytes_sent = 0
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        sizes = list(executor.map(fetch, urls))
+    elapsed = time.perf_counter() - start
+    print(f'{name:>8}: {elapsed:6.3f} s, {len(urls) / elapsed:7.1f} pages/s, '
+          f'{server.bytes_sent / 1024:8.0f} KiB sent, {sum(sizes) / 1024:8.0f} KiB read')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark article downloads')
+    parser.add_argument('--pages', type=int, default=50)
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--page-size', type=int, default=200 * 1024)
+    parser.add_argument('--connect-latency', type=float, default=0.05)
+    args = parser.parse_args()
+
+    server = http.server.ThreadingHTTPServer(
+        ('127.0.0.1', 0), make_handler(args.page_size, args.connect_latency)
+    )
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    urls = [f'http://127.0.0.1:{server.server_port}/article/{i}' for i in range(args.pages)]
+
+    run('urlopen', lambda url: len(urlopen(url, timeout=10).read()), urls, args.workers, server)
+
+    client = HTTPClient(max_idle_per_host=args.workers)
+    run('pooled', lambda url: len(client.get(url).body), urls, args.workers, server)
+
+    server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
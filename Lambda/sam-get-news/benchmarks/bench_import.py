@@ -0,0 +1,54 @@
+# Measure the import time of the function module (the init phase of a cold
+# start) with python -X importtime, and optionally fail above a threshold
+#   python bench_import.py --top 15 --max-ms 150
+
+import os
+import sys
+import argparse
+import subprocess
+
+GET_NEWS = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'get_news')
+
+
+def import_times(module, repeat):
+    env = dict(os.environ, OUTPUT_BUCKET='bucket', OUTPUT_FILE='news.json', RSS_LINK='http://localhost/')
+    env.setdefault('AWS_DEFAULT_REGION', 'us-east-1')
+    best = None
+    for _ in range(repeat):
+        result = subprocess.run(
+            [sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+            cwd=GET_NEWS, env=env, capture_output=True, text=True, check=True
+        )
+        times = {}
+        for line in result.stderr.splitlines():
+            if not line.startswith('import time:') or 'self [us]' in line:
+                continue
+            parts = line[len('import time:'):].split('|')
+            self_us, cumulative_us, name = int(parts[0]), int(parts[1]), parts[2].strip()
+            times[name] = (self_us, cumulative_us)
+        if best is None or times[module][1] < best[module][1]:
+            best = times
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Measure the import time of the function')
+    parser.add_argument('--module', default='app')
+    parser.add_argument('--repeat', type=int, default=5, help='keep the fastest run')
+    parser.add_argument('--top', type=int, default=10, help='slowest imports to show')
+    parser.add_argument('--max-ms', type=float, help='exit with an error above this time')
+    args = parser.parse_args()
+
+    times = import_times(args.module, args.repeat)
+    total_ms = times[args.module][1] / 1000
+    print(f'{args.module}: {total_ms:.1f} ms')
+    slowest = sorted(times.items(), key=lambda kv: kv[1][1], reverse=True)
+    for name, (_, cumulative_us) in [kv for kv in slowest if kv[0] != args.module][:args.top]:
+        print(f'  {cumulative_us / 1000:8.1f} ms  {name}')
+
+    if args.max_ms is not None and total_ms > args.max_ms:
+        sys.exit(f'Import time {total_ms:.1f} ms is above {args.max_ms} ms')
+
+
+if __name__ == '__main__':
+    main()
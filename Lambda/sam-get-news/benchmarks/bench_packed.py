@@ -0,0 +1,100 @@
+# Compare the size of the JSON and compact binary news, and the peak memory to
+# decode them on the device: the whole JSON text and its parsed dictionary,
+# or one field at a time into a fixed buffer, as display_news.py does
+#
+#   python bench_packed.py --entries 10 --title-size 80
+
+import io
+import os
+import sys
+import json
+import argparse
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'get_news'))
+
+from packed import MAGIC, MAX_FIELD_BYTES, pack_news, unpack_news
+
+
+def make_news(entries, title_size, summary_size):
+    return {
+        'title': 'Feed title',
+        'entries': [{
+            'title': f'{n} ' + 'T' * title_size,
+            'link': f'https://example.com/news/{n}',
+            'summary': 'Summary text. ' * (summary_size // 14)
+        } for n in range(entries)]
+    }
+
+
+def read_into(stream, mv):
+    n = 0
+    while n < len(mv):
+        n += stream.readinto(mv[n:])
+
+
+# Same as stream_news in display_news.py
+def stream_news(stream, buffer):
+    view = memoryview(buffer)
+
+    def field():
+        read_into(stream, view[:2])
+        size = buffer[0] << 8 | buffer[1]
+        read_into(stream, view[:size])
+        return view[:size]
+
+    read_into(stream, view[:6])
+    assert bytes(view[:4]) == MAGIC
+    count = buffer[4] << 8 | buffer[5]
+    yield str(field(), 'utf-8')
+    for _ in range(count):
+        field()
+        field()
+        yield str(field(), 'utf-8')
+
+
+def json_texts(data):
+    news = json.loads(data.decode())
+    return [news['title']] + [e['summary'] for e in news['entries']]
+
+
+def measure(function):
+    tracemalloc.start()
+    function()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the compact news format')
+    parser.add_argument('--entries', type=int, default=10)
+    parser.add_argument('--title-size', type=int, default=80)
+    parser.add_argument('--summary-size', type=int, default=240)
+    args = parser.parse_args()
+
+    news = make_news(args.entries, args.title_size, args.summary_size)
+    json_data = json.dumps(news).encode()
+    packed_data = pack_news(news)
+    assert unpack_news(packed_data) == news
+    buffer = bytearray(MAX_FIELD_BYTES)
+
+    def decode_json():
+        for text in json_texts(json_data):
+            pass
+
+    def decode_packed():
+        for text in stream_news(io.BytesIO(packed_data), buffer):
+            pass
+
+    print(f'{args.entries} entries')
+    for name, data, function in [
+        ('json', json_data, decode_json),
+        ('packed', packed_data, decode_packed),
+    ]:
+        peak = measure(function)
+        print(f'{name:>8}: {len(data):8d} bytes, peak memory to decode {peak / 1024:8.1f} KiB')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,85 @@
+# Throughput of the adaptive rate limiter against a fake Bedrock client that
+# throttles above a given rate, compared with plain exponential backoff.
+# Fails when the steady-state adaptive throughput, after the ramp-up from the
+# initial rate, is below --min-ratio of the allowed rate
+#   python bench_ratelimit.py --requests 100 --allowed-rate 4
+
+import os
+import sys
+import time
+import random
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'get_news'))
+
+from botocore.exceptions import ClientError
+from ratelimit import AdaptiveRateLimiter
+from fake_bedrock import FakeBedrock
+
+
+# Roughly what botocore standard retries do
+def backoff_call(function, max_retries=10, base_delay=0.5, max_delay=20.0):
+    for attempt in range(max_retries + 1):
+        try:
+            return function()
+        except ClientError:
+            if attempt == max_retries:
+                raise
+            time.sleep(random.uniform(0, min(max_delay, base_delay * 2 ** attempt)))
+
+
+# Successful requests per second, overall and in the steady state (the last
+# two thirds of the successful requests); requests that fail after all the
+# retries are counted and not raised
+def run(name, call, bedrock, requests, workers, allowed_rate):
+    done = []
+
+    def request(_):
+        try:
+            call(lambda: bedrock.invoke_model(body='{}', modelId='m', accept='a', contentType='c'))
+        except ClientError:
+            return
+        done.append(time.perf_counter())
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        list(executor.map(request, range(requests)))
+    elapsed = time.perf_counter() - start
+    done.sort()
+    ramp_up = len(done) // 3
+    throughput = len(done) / elapsed
+    steady = (len(done) - 1 - ramp_up) / (done[-1] - done[ramp_up]) if len(done) - ramp_up > 1 else 0.0
+    print(f'{name:>9}: {elapsed:6.2f} s, {throughput:5.2f} req/s, steady {steady:5.2f} req/s '
+          f'({steady / allowed_rate:4.0%} of allowed), {requests - len(done)} failed, '
+          f'{bedrock.throttles} throttles in {bedrock.calls} calls')
+    return steady
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark model rate limiting')
+    parser.add_argument('--requests', type=int, default=150)
+    parser.add_argument('--workers', type=int, default=8)
+    parser.add_argument('--allowed-rate', type=float, default=4.0)
+    parser.add_argument('--latency', type=float, default=0.2)
+    parser.add_argument('--min-ratio', type=float, default=0.85,
+                        help='minimum steady-state adaptive throughput, as a fraction of the allowed rate')
+    args = parser.parse_args()
+
+    print(f'Allowed rate: {args.allowed_rate} req/s')
+
+    bedrock = FakeBedrock(args.latency, args.allowed_rate)
+    run('backoff', backoff_call, bedrock, args.requests, args.workers, args.allowed_rate)
+
+    bedrock = FakeBedrock(args.latency, args.allowed_rate)
+    limiter = AdaptiveRateLimiter(rate=1.0, max_rate=2 * args.allowed_rate)
+    steady = run('adaptive', limiter.call, bedrock, args.requests, args.workers, args.allowed_rate)
+    print(f'Final limiter rate: {limiter.rate:.2f} req/s')
+
+    if steady < args.min_ratio * args.allowed_rate:
+        sys.exit(f'Adaptive steady-state throughput {steady:.2f} req/s is below {args.min_ratio:.0%} '
+                 'of the allowed rate')
+
+
+if __name__ == '__main__':
+    main()
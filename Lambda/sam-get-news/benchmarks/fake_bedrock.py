@@ -0,0 +1,91 @@
+# Stand-in for the bedrock-runtime client, to run the function offline
+
+import io
+import re
+import json
+import time
+import random
+import threading
+from botocore.exceptions import ClientError
+
+
+class FakeBedrock:
+    def __init__(self, latency=0.0, allowed_rate=None, throttle_rate=0.0, completion=None, miss_rate=0.0,
+                 trailing='', chunk_size=16):
+        self.latency = latency  # Seconds for each response
+        self.allowed_rate = allowed_rate  # Requests per second before throttling
+        self.throttle_rate = throttle_rate  # Probability of a random throttle
+        self.completion = completion or '<summary>Summary of the article. It has key facts.</summary>'
+        self.miss_rate = miss_rate  # Probability of leaving an article out of a batch response
+        self.trailing = trailing  # Generated after the summary, the latency includes it
+        self.chunk_size = chunk_size  # Characters in each event of a response stream
+        self.tokens = 1.0
+        self.last_refill = time.monotonic()
+        self.lock = threading.Lock()
+        self.calls = 0
+        self.throttles = 0
+
+    def throttled(self):
+        with self.lock:
+            self.calls += 1
+            if random.random() < self.throttle_rate:
+                self.throttles += 1
+                return True
+            if self.allowed_rate is None:
+                return False
+            now = time.monotonic()
+            self.tokens = min(1.0, self.tokens + (now - self.last_refill) * self.allowed_rate)
+            self.last_refill = now
+            if self.tokens < 1.0:
+                self.throttles += 1
+                return True
+            self.tokens -= 1.0
+            return False
+
+    def check_throttling(self, operation_name):
+        if self.throttled():
+            raise ClientError(
+                {'Error': {'Code': 'ThrottlingException', 'Message': 'Too many requests'}},
+                operation_name
+            )
+
+    def invoke_model(self, body, modelId, accept, contentType):
+        self.check_throttling('InvokeModel')
+        time.sleep(self.latency)
+        return {'body': io.BytesIO(json.dumps({'completion': self.complete(body)}).encode())}
+
+    # The latency is spread over the events, as if the output was generated
+    def invoke_model_with_response_stream(self, body, modelId, accept, contentType):
+        self.check_throttling('InvokeModelWithResponseStream')
+        return {'body': FakeEventStream(self.complete(body), self.latency, self.chunk_size)}
+
+    # Batch prompts get a summary for each <doc id="..."> in the prompt
+    def complete(self, body):
+        ids = re.findall(r'<doc id="([^"]+)">', json.loads(body).get('prompt', ''))
+        if not ids:
+            return self.completion + self.trailing
+        return '\n'.join(
+            f'<summary id="{i}">Summary of article {i}. It has key facts.</summary>'
+            for i in ids if random.random() >= self.miss_rate
+        )
+
+
+class FakeEventStream:
+    def __init__(self, completion, latency, chunk_size):
+        self.completion = completion
+        self.latency = latency
+        self.chunk_size = chunk_size
+        self.closed = False
+        self.chars_sent = 0
+
+    def __iter__(self):
+        for i in range(0, len(self.completion), self.chunk_size):
+            if self.closed:
+                return
+            piece = self.completion[i:i + self.chunk_size]
+            time.sleep(self.latency * len(piece) / len(self.completion))
+            self.chars_sent += len(piece)
+            yield {'chunk': {'bytes': json.dumps({'completion': piece}).encode()}}
+
+    def close(self):
+        self.closed = True
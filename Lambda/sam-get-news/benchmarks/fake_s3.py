@@ -0,0 +1,30 @@
+# Stand-in for the S3 client, keeping the objects in memory
+
+import io
+import threading
+from botocore.exceptions import ClientError
+
+
+class FakeS3:
+    def __init__(self):
+        self.objects = {}
+        self.lock = threading.Lock()
+        self.puts = 0
+        self.gets = 0
+
+    def put_object(self, Bucket, Key, Body):
+        if isinstance(Body, str):
+            Body = Body.encode()
+        with self.lock:
+            self.objects[(Bucket, Key)] = Body
+            self.puts += 1
+
+    def get_object(self, Bucket, Key):
+        with self.lock:
+            self.gets += 1
+            if (Bucket, Key) not in self.objects:
+                raise ClientError(
+                    {'Error': {'Code': 'NoSuchKey', 'Message': 'The specified key does not exist.'}},
+                    'GetObject'
+                )
+            return {'Body': io.BytesIO(self.objects[(Bucket, Key)])}
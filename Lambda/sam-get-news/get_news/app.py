@@ -1,30 +1,96 @@
 import os
 import json
-from urllib.request import urlopen
-import boto3
-from botocore.config import Config
-import feedparser
-from bs4 import BeautifulSoup
+import time
+import re
+import hashlib
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from urllib.parse import urlparse
+from extract import extract_text
+from storage import S3Storage, LocalStorage
+from cache import SummaryCache
+from archive import EditionArchive
+from tokens import estimate_tokens, split_text
+from ratelimit import AdaptiveRateLimiter
+from http_client import HTTPClient
+from metrics import Metrics, TimedReader
+from render import PROFILES, render_pages
+from raster import rasterize_pages
+from packed import pack_news
 
 BUCKET_NAME = os.environ['OUTPUT_BUCKET']
 OBJECT_NAME = os.environ['OUTPUT_FILE']
-RSS_LINK = os.environ['RSS_LINK']
+RSS_LINK = os.environ.get('RSS_LINK')
+RSS_LINKS = os.environ.get('RSS_LINKS')  # More than one feed, separated by spaces or new lines
+FEEDS_CONFIG = os.environ.get('FEEDS_CONFIG')  # Or a JSON list of feeds in the bucket
+FEEDS_PREFIX = os.environ.get('FEEDS_PREFIX', 'feeds/')  # Output of each feed
+INDEX_FILE = os.environ.get('INDEX_FILE', 'index.json')  # List of feeds and their output
 SPECIAL_INSTRUCTIONS = os.environ.get('SPECIAL_INSTRUCTIONS', '')
 DEBUG = os.environ.get('DEBUG', 'false').lower() == 'true'
+MAX_ENTRIES = int(os.environ.get('MAX_ENTRIES', '10'))  # Most recent entries in the news
+MIN_ENTRIES = int(os.environ.get('MIN_ENTRIES', '5'))  # With fewer, the previous news is kept
+INCREMENTAL = os.environ.get('INCREMENTAL', 'false').lower() == 'true'  # Reuse previous news
+MAX_WORKERS = int(os.environ.get('MAX_WORKERS', '4'))  # Entries processed concurrently
+URL_TIMEOUT = float(os.environ.get('URL_TIMEOUT', '10'))  # Seconds to wait for a site
+CONNECT_TIMEOUT = float(os.environ.get('CONNECT_TIMEOUT', '5'))  # Seconds to connect to a site
+MAX_TEXT_CHARS = int(os.environ.get('MAX_TEXT_CHARS', '100000'))  # Stop reading long pages
+CACHE_FILE = os.environ.get('CACHE_FILE', 'summary_cache.json')
+CACHE_DIR = os.environ.get('CACHE_DIR')  # Local directory instead of S3, for testing
+CACHE_MAX_AGE_DAYS = float(os.environ.get('CACHE_MAX_AGE_DAYS', '30'))
+CACHE_MAX_ENTRIES = int(os.environ.get('CACHE_MAX_ENTRIES', '500'))
+FEED_STATE_FILE = os.environ.get('FEED_STATE_FILE', 'feed_state.json')
+MAX_ARTICLE_TOKENS = int(os.environ.get('MAX_ARTICLE_TOKENS', '6000'))  # Longer articles are split
+MAX_CHUNKS = int(os.environ.get('MAX_CHUNKS', '8'))  # Text after these chunks is ignored
+MODEL_RATE = float(os.environ.get('MODEL_RATE', '1'))  # Initial model invocations per second
+MODEL_MAX_RATE = float(os.environ.get('MODEL_MAX_RATE', '5'))
+MODEL_MAX_RETRIES = int(os.environ.get('MODEL_MAX_RETRIES', '8'))
+STREAM_RESPONSES = os.environ.get('STREAM_RESPONSES', 'false').lower() == 'true'  # Stop at </summary>
+BATCH_MODE = os.environ.get('BATCH_MODE', 'false').lower() == 'true'  # More articles in a prompt
+BATCH_MAX_TOKENS = int(os.environ.get('BATCH_MAX_TOKENS', '6000'))
+BATCH_MAX_ARTICLES = int(os.environ.get('BATCH_MAX_ARTICLES', '8'))
+MAX_SUMMARY_CHARS = 240
+OUTPUT_PROFILES = os.environ.get('OUTPUT_PROFILES', '').replace(',', ' ').split()  # Pre-wrapped pages
+OUTPUT_RASTER = os.environ.get('OUTPUT_RASTER', 'false').lower() == 'true'  # Pages for the e-paper buffer
+OUTPUT_BINARY = os.environ.get('OUTPUT_BINARY', 'false').lower() == 'true'  # Compact news for devices
+ARCHIVE = os.environ.get('ARCHIVE', 'false').lower() == 'true'  # Keep the history of the entries
+ARCHIVE_PREFIX = os.environ.get('ARCHIVE_PREFIX', 'archive/')
+METRICS = os.environ.get('METRICS', 'true').lower() == 'true'  # Print EMF records
+METRICS_NAMESPACE = os.environ.get('METRICS_NAMESPACE', 'GetTheNews')
 
 TEXT_MODEL_ID = 'anthropic.claude-v2'
 ACCEPT = 'application/json'
 CONTENT_TYPE = 'application/json'
 
-config = Config(
-    retries={
-        'max_attempts': 10,
-        'mode': 'standard'
-    }
-)
+clients = {}
+clients_lock = threading.Lock()
+
+
+# AWS clients are created on first use, to keep the init phase short, and
+# reused by the following warm invocations
+def get_client(service_name, retries=None):
+    with clients_lock:
+        if service_name not in clients:
+            import boto3
+            from botocore.config import Config
+            config = Config(retries=retries) if retries else None
+            clients[service_name] = boto3.client(service_name, config=config)
+        return clients[service_name]
+
+
+def get_s3():
+    return get_client('s3')
+
+
+# Throttling is retried by the rate limiter, not by botocore
+def get_bedrock():
+    return get_client('bedrock-runtime', retries={'max_attempts': 0, 'mode': 'standard'})
+
 
-s3 = boto3.resource('s3')
-bedrock = boto3.client("bedrock-runtime", config=config)
+storage = LocalStorage(CACHE_DIR) if CACHE_DIR else S3Storage(get_s3, BUCKET_NAME)
+summary_cache = SummaryCache(storage, CACHE_FILE, CACHE_MAX_AGE_DAYS, CACHE_MAX_ENTRIES)
+archive = EditionArchive(storage, ARCHIVE_PREFIX)
+http = HTTPClient(CONNECT_TIMEOUT, URL_TIMEOUT, max_idle_per_host=MAX_WORKERS)
+rate_limiter = AdaptiveRateLimiter(MODEL_RATE, MODEL_MAX_RATE, max_retries=MODEL_MAX_RETRIES)
 
 summary_prompt_template = '''Write a concise summary (max 200 characters)
     including all the key facts of this article.
@@ -37,7 +103,60 @@ summary_prompt_template = '''Write a concise summary (max 200 characters)
     </doc>
 '''
 
-def invoke_text_model(prompt_data):
+chunk_prompt_template = '''Write a summary (max 600 characters)
+    including all the key facts of this part of an article.
+    Do not repeat the same concept.
+    Ignore header and footer information.
+    Just write the summary between the <summary></summary> XML tags with no text before and after.
+    <doc>
+    {article}
+    </doc>
+'''
+
+batch_prompt_template = '''For each of the following articles, write a concise summary (max 200 characters)
+    including all the key facts of the article.
+    Do not repeat the same concept.
+    Ignore header and footer information.
+    Write the summary of each article between <summary id="ID"></summary> XML tags,
+    where ID is the id of the article's doc tag, with no text before and after.
+    {special_instructions}
+    {articles}
+'''
+
+# Metrics that are not printed, when the caller doesn't collect them
+def no_metrics():
+    return Metrics(METRICS_NAMESPACE, enabled=False)
+
+
+# Read the completion while it is generated, and close the stream as soon as
+# stop_at is found, without waiting for the rest of the output
+def stream_text_model(body, stop_at, metrics):
+    response = get_bedrock().invoke_model_with_response_stream(
+        body=body, modelId=TEXT_MODEL_ID, accept=ACCEPT, contentType=CONTENT_TYPE
+    )
+    stream = response.get("body")
+    completion = ''
+    try:
+        for event in stream:
+            chunk = event.get("chunk")
+            if chunk is None:
+                continue
+            start = max(0, len(completion) - len(stop_at or ''))
+            completion += json.loads(chunk["bytes"]).get("completion", "")
+            if stop_at:
+                end = completion.find(stop_at, start)
+                if end >= 0:
+                    completion = completion[:end + len(stop_at)]
+                    metrics.add("StreamsStoppedEarly", 1)
+                    break
+    finally:
+        stream.close()
+    return completion
+
+
+def invoke_text_model(prompt_data, metrics=None, stop_at=None):
+    metrics = metrics or no_metrics()
+
     if DEBUG:
         print(prompt_data)
 
@@ -53,12 +172,20 @@ def invoke_text_model(prompt_data):
         }
     )
 
-    response = bedrock.invoke_model(
-        body=body, modelId=TEXT_MODEL_ID, accept=ACCEPT, contentType=CONTENT_TYPE
-    )
-    response_body = json.loads(response.get("body").read())
-
-    outputText = response_body.get("completion")
+    with metrics.stage("ModelInvokeTime"):
+        if STREAM_RESPONSES:
+            outputText = rate_limiter.call(stream_text_model, body, stop_at, metrics)
+        else:
+            response = rate_limiter.call(
+                get_bedrock().invoke_model,
+                body=body, modelId=TEXT_MODEL_ID, accept=ACCEPT, contentType=CONTENT_TYPE
+            )
+            response_body = json.loads(response.get("body").read())
+            outputText = response_body.get("completion")
+
+    metrics.add("ModelCalls", 1)
+    metrics.add("PromptChars", len(prompt_data))
+    metrics.add("CompletionChars", len(outputText or ''))
 
     if DEBUG:
         print(outputText)
@@ -68,26 +195,30 @@ def invoke_text_model(prompt_data):
 
 # Create an S3 object from a string
 def create_s3_object(bucket_name, object_name, object_content):
-    s3.Object(bucket_name, object_name).put(Body=object_content)
+    get_s3().put_object(Bucket=bucket_name, Key=object_name, Body=object_content)
+
 
+# Read an S3 object, None if it doesn't exist
+def get_s3_object(bucket_name, object_name):
+    return S3Storage(get_s3, bucket_name).get(object_name)
 
-def get_text_from_url(url):
-    html = urlopen(url).read()
-    soup = BeautifulSoup(html, features="html.parser")
 
-    # kill all script and style elements
-    for script in soup(["script", "style"]):
-        script.extract()    # rip it out
+def get_text_from_url(url, metrics=None):
+    metrics = metrics or no_metrics()
 
-    # get text
-    text = soup.get_text()
+    start = time.perf_counter()
+    with http.stream(url) as response:
+        connected = time.perf_counter()
+        reader = TimedReader(response)
+        text = extract_text(reader, response.encoding, max_chars=MAX_TEXT_CHARS)
+    end = time.perf_counter()
 
-    # break into lines and remove leading and trailing space on each
-    lines = (line.strip() for line in text.splitlines())
-    # break multi-headlines into a line each
-    chunks = (phrase.strip() for line in lines for phrase in line.split("  "))
-    # drop blank lines
-    text = '\n'.join(chunk for chunk in chunks if chunk)
+    # Download and extraction are interleaved, the time spent reading is the download
+    download = connected - start + reader.seconds
+    metrics.add("DownloadTime", download * 1000, 'Milliseconds')
+    metrics.add("ExtractTime", (end - start - download) * 1000, 'Milliseconds')
+    metrics.add("DownloadBytes", reader.bytes, 'Bytes')
+    metrics.add("TextChars", len(text))
 
     return text
 
@@ -102,49 +233,481 @@ def get_delimited_text(text, start_delimeter, end_delimeter, exclude_delimeters=
     return substring.strip(" \n")
 
 
-def lambda_handler(event, context):
+def clean_summary(summary):
+    summary = summary.replace('  ', ' ').replace(' \n', '\n').replace('\n\n\n', '\n\n').strip()
+
+    # Keep the sentences that fit
+    if len(summary) > MAX_SUMMARY_CHARS:
+        cut = summary.rfind(". ", 0, MAX_SUMMARY_CHARS + 1)
+        if cut > 0:
+            summary = summary[:cut].strip() + "."
+
+    return summary
+
+
+def summarize_text(template, article, metrics=None):
+    return get_delimited_text(
+        invoke_text_model(template.format(
+            special_instructions=SPECIAL_INSTRUCTIONS,
+            article=article
+    ), metrics, stop_at="</summary>"), "<summary>", "</summary>", exclude_delimeters=True)
+
+
+# Long articles are split into chunks that are summarized in parallel,
+# then the summaries of the chunks are summarized together
+def summarize_article(title, text, metrics=None):
+    article = title + "\n\n" + text
+    if estimate_tokens(article) <= MAX_ARTICLE_TOKENS:
+        return summarize_text(summary_prompt_template, article, metrics)
+
+    chunks = split_text(text, MAX_ARTICLE_TOKENS)[:MAX_CHUNKS]
+    with ThreadPoolExecutor(max_workers=min(len(chunks), MAX_WORKERS)) as executor:
+        summaries = list(executor.map(
+            lambda chunk: summarize_text(chunk_prompt_template, title + "\n\n" + chunk, metrics),
+            chunks
+        ))
+
+    return summarize_text(summary_prompt_template, title + "\n\n" + "\n\n".join(summaries), metrics)
+
+
+# Download the text of an entry and look for its summary in the cache
+def prepare_entry(entry):
+    item = {"title": entry["title"], "link": entry["link"]}
+    metrics = Metrics(METRICS_NAMESPACE, METRICS, Link=item["link"], Host=urlparse(item["link"]).netloc)
+    item["metrics"] = metrics
+    try:
+        item["text"] = get_text_from_url(item["link"], metrics)
+        article = item["title"] + "\n\n" + item["text"]
+        item["cache_key"] = SummaryCache.make_key(item["link"], article, SPECIAL_INSTRUCTIONS, TEXT_MODEL_ID)
+        item["summary"] = summary_cache.get(item["cache_key"])
+    except Exception:
+        metrics.add("EntryErrors", 1)
+        metrics.emit()
+        raise
+    metrics.add("CacheHits", 0 if item["summary"] is None else 1)
+    return item
+
+
+def set_summary(item, summary):
+    with item["metrics"].stage("PostProcessTime"):
+        summary = clean_summary(summary)
+    summary_cache.put(item["cache_key"], summary)
+    item["summary"] = summary
+
+
+# Summarize an entry on its own, unless it already has a summary
+def summarize_item(item):
+    metrics = item["metrics"]
+    try:
+        if item["summary"] is None:
+            set_summary(item, summarize_article(item["title"], item["text"], metrics))
+    except Exception:
+        metrics.add("EntryErrors", 1)
+        raise
+    finally:
+        metrics.emit()
+
+    return {"title": item["title"], "link": item["link"], "summary": item["summary"]}
+
+
+def summarize_entry(entry):
+    return summarize_item(prepare_entry(entry))
+
+
+# Group short articles into batches, using the estimated tokens of each
+# article, as the articles come; longer articles are summarized on their own.
+# Each batch is yielded as soon as it is full
+def make_batches(items):
+    batch = []
+    tokens = 0
+    for item in items:
+        item_tokens = estimate_tokens(item["title"] + "\n\n" + item["text"])
+        if item_tokens > BATCH_MAX_TOKENS // 2:
+            yield [item]
+            continue
+        if batch and tokens + item_tokens > BATCH_MAX_TOKENS:
+            yield batch
+            batch = []
+            tokens = 0
+        batch.append(item)
+        tokens += item_tokens
+        if len(batch) >= BATCH_MAX_ARTICLES:
+            yield batch
+            batch = []
+            tokens = 0
+    if batch:
+        yield batch
+
+
+# Summarize a batch of articles with one model invocation, the articles
+# missing from the response are then summarized on their own
+def summarize_batch(batch):
+    summaries = {}
+    if len(batch) > 1:
+        articles = '\n'.join(
+            f'<doc id="{i}">\n{item["title"]}\n\n{item["text"]}\n</doc>' for i, item in enumerate(batch)
+        )
+        metrics = Metrics(METRICS_NAMESPACE, METRICS, BatchSize=len(batch))
+        try:
+            completion = invoke_text_model(batch_prompt_template.format(
+                special_instructions=SPECIAL_INSTRUCTIONS,
+                articles=articles
+            ), metrics)
+            summaries = dict(re.findall(r'<summary id="([^"]+)">(.*?)</summary>', completion or '', re.S))
+        except Exception as e:
+            print(f"Batch of {len(batch)} articles failed: {e!r}")
+        finally:
+            metrics.emit()
+
+    results = []
+    for i, item in enumerate(batch):
+        try:
+            summary = summaries.get(str(i), '').strip(" \n")
+            if summary:
+                set_summary(item, summary)
+                item["metrics"].add("BatchedEntries", 1)
+            results.append(summarize_item(item))
+        except Exception as e:  # One failing entry must not stop the others
+            print(f"Skipping {item['link']}: {e!r}")
+    return results
+
+
+# Wait for the futures until the deadline, skipping the ones that fail
+def wait_for(futures, deadline):
+    results = {}
+    for key, future in futures.items():
+        timeout = None if deadline is None else max(0, deadline - time.monotonic())
+        try:
+            results[key] = future.result(timeout=timeout)
+        except Exception as e:  # One failing site must not stop the others
+            print(f"Skipping {key}: {e!r}")
+    return results
+
+
+# Prepared entries that need a summary, in the order they finish until the
+# deadline; the ones with a cached summary go to the results directly
+def prepared_items(futures, deadline, results):
+    timeout = None if deadline is None else max(0, deadline - time.monotonic())
+    try:
+        for future in as_completed(futures, timeout):
+            try:
+                item = future.result()
+            except Exception as e:  # One failing site must not stop the others
+                print(f"Skipping {futures[future]}: {e!r}")
+                continue
+            if item["summary"] is None:
+                yield item
+            else:
+                results[item["link"]] = summarize_item(item)
+    except TimeoutError as e:
+        for future, link in futures.items():
+            if not future.done():
+                print(f"Skipping {link}: {e!r}")
+
+
+# Download and summarize entries concurrently, each link only once even
+# when it is in more than one feed
+def summarize_entries(entries, deadline=None):
+    unique = {}
+    for entry in entries:
+        unique.setdefault(entry["link"], entry)
+
+    executor = ThreadPoolExecutor(max_workers=MAX_WORKERS)
+    batch_executor = None
+    try:
+        if not BATCH_MODE:
+            return wait_for(
+                {link: executor.submit(summarize_entry, entry) for link, entry in unique.items()},
+                deadline
+            )
+
+        # Batches are summarized in their own pool while the other entries
+        # are still downloading
+        prepared = {executor.submit(prepare_entry, entry): link for link, entry in unique.items()}
+        batch_executor = ThreadPoolExecutor(max_workers=MAX_WORKERS)
+        results = {}
+        futures = {}
+        for batch in make_batches(prepared_items(prepared, deadline, results)):
+            futures[' '.join(item["link"] for item in batch)] = batch_executor.submit(summarize_batch, batch)
+
+        for batch_results in wait_for(futures, deadline).values():
+            for n in batch_results:
+                results[n["link"]] = n
+        return results
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+        if batch_executor is not None:
+            batch_executor.shutdown(wait=False, cancel_futures=True)
+
+
+# Stop waiting for entries some time before the Lambda timeout
+def get_deadline(context, margin=10):
+    if not hasattr(context, 'get_remaining_time_in_millis'):
+        return None
+    return time.monotonic() + context.get_remaining_time_in_millis() / 1000 - margin
+
+
+# Fail early on a misspelled profile, before anything is downloaded
+def check_profiles():
+    for name in OUTPUT_PROFILES:
+        if name not in PROFILES:
+            raise ValueError(f"Unknown output profile {name}, use one of: {', '.join(PROFILES)}")
+
+
+# Feeds to summarize, each written to its own output object
+
+def load_feeds():
+    if FEEDS_CONFIG:
+        feeds = json.loads(get_s3_object(BUCKET_NAME, FEEDS_CONFIG))
+    elif RSS_LINKS:
+        feeds = RSS_LINKS.split()
+    else:
+        return [{"link": RSS_LINK, "output": OBJECT_NAME}]
+    feeds = [f if isinstance(f, dict) else {"link": f} for f in feeds]
+    return [dict(f, output=f.get("output") or get_feed_output_name(f["link"])) for f in feeds]
+
+
+def get_feed_output_name(link):
+    url = urlparse(link)
+    return FEEDS_PREFIX + re.sub(r'[^A-Za-z0-9]+', '-', url.netloc + url.path).strip('-') + '.json'
+
+
+# Other formats next to the JSON output, e.g. news.json -> news.pages
+def get_related_output_name(output, extension):
+    return re.sub(r'\.json$', '', output) + extension
+
+
+# ETag, Last-Modified and entries of each feed at the last run, by feed link
+
+def load_feed_state():
+    content = storage.get(FEED_STATE_FILE)
+    return json.loads(content) if content else {}
+
+
+def save_feed_state(feed_state):
+    storage.put(FEED_STATE_FILE, json.dumps(feed_state))
+
+
+# Changes when the entries to summarize or the way they are summarized change
+def get_entries_digest(entries):
+    digest = hashlib.sha256()
+    for part in [TEXT_MODEL_ID, SPECIAL_INSTRUCTIONS] + [e.get("id", e["link"]) for e in entries]:
+        digest.update(part.encode())
+        digest.update(b'\0')
+    return digest.hexdigest()
+
+
+# Changes when the way entries are summarized changes, the previous news is
+# reused only when it was summarized with the same settings
+def get_settings_digest():
+    return hashlib.sha256(f"{TEXT_MODEL_ID}\0{SPECIAL_INSTRUCTIONS}".encode()).hexdigest()
+
+
+# Entries of the previous news by link, to summarize only the new ones
+def load_previous_entries(object_name):
+    content = get_s3_object(BUCKET_NAME, object_name)
+    if not content:
+        return {}
+    return {n["link"]: n for n in json.loads(content)["entries"]}
 
-    d = feedparser.parse(RSS_LINK)
 
-    news = {
+# Keep the order of the feed, taking each entry from the previous or the new news
+def merge_entries(entries, previous, summarized):
+    merged = []
+    for entry in entries:
+        n = previous.get(entry["link"]) or summarized.get(entry["link"])
+        if n is not None:
+            merged.append(dict(n, title=entry["title"]))
+    return merged
+
+
+# Parse a feed and find the entries to summarize, None if nothing changed
+def check_feed(feed, state, force, metrics):
+    if state.get("settings_digest") != get_settings_digest():  # Summarize again, even if the feed is the same
+        state = dict(state, etag=None, modified=None)
+    headers = {}
+    if state.get("etag"):
+        headers["If-None-Match"] = state["etag"]
+    if state.get("modified"):
+        headers["If-Modified-Since"] = state["modified"]
+    with metrics.stage("FeedDownloadTime"):
+        response = http.get(feed["link"], headers)
+    metrics.add("FeedBytes", len(response.body), 'Bytes')
+
+    if response.status == 304:
+        print(f"Feed not modified: {feed['link']}")
+        return state, None
+
+    import feedparser  # Imported on first use, to keep the init phase short
+    with metrics.stage("FeedParseTime"):
+        d = feedparser.parse(response.body, response_headers=response.headers)
+    state = dict(state, etag=response.headers.get("etag"), modified=response.headers.get("last-modified"))
+
+    entries = d.entries[:MAX_ENTRIES]
+    entries_digest = get_entries_digest(entries)
+
+    if entries_digest == state.get("entries_digest"):
+        print(f"Feed entries not changed: {feed['link']}")
+        return state, None
+
+    reuse = INCREMENTAL and not force and state.get("settings_digest") == get_settings_digest()
+    previous = load_previous_entries(feed["output"]) if reuse else {}
+    new_entries = [e for e in entries if e["link"] not in previous]
+    print(f"{len(new_entries)} new entries out of {len(entries)}: {feed['link']}")
+
+    state = dict(state, title=d.feed.title, output=feed["output"])
+    return state, {
+        "feed": feed,
         "title": d.feed.title,
-        "entries": []
+        "entries": entries,
+        "entries_digest": entries_digest,
+        "previous": previous,
+        "new_entries": new_entries
     }
 
-    for entry in d.entries[:10]:  # More recent ten to avoid throttling
-        n = {}
-        n["title"] = entry["title"]
-        n["link"] = entry["link"]
-        text = get_text_from_url(n["link"])
-        article = n["title"] + "\n\n" + text
 
-        summary = get_delimited_text(
-            invoke_text_model(summary_prompt_template.format(
-                special_instructions=SPECIAL_INSTRUCTIONS,
-                article=article
-        )), "<summary>", "</summary>", exclude_delimeters=True)
-        
-        summary = summary.replace('  ', ' ').replace(' \n', '\n').replace('\n\n\n', '\n\n').strip(' \n') + '\n'
+def make_feed_news(update, summarized):
+    return {
+        "title": update["title"],
+        "entries": merge_entries(update["entries"], update["previous"], summarized)
+    }
+
 
-        while True:
-            summary = summary.strip()
-            if len(summary) <= 240:
-                break
-            sentences = summary.split(". ")
-            sentences.pop()  # Remove last sentence
-            if len(sentences) == 0:
-                break
-            summary = ". ".join(sentences) + "."
+# A partial edition replaces the previous news only with at least MIN_ENTRIES
+# entries, or as many as the previous news, so that a failing model doesn't
+# leave the devices with empty news until the next run
+def is_publishable(news, state):
+    count = len(news["entries"])
+    return count > 0 and (count >= MIN_ENTRIES or count >= state.get("published_entries", 0))
 
-        n["summary"] = summary
 
-        news["entries"].append(n)
+def write_feed_news(update, news, metrics):
+    if OUTPUT_PROFILES:
+        with metrics.stage("RenderTime"):
+            news["pages"] = render_pages(news, OUTPUT_PROFILES)
 
     json_news = json.dumps(news)
 
     print(json_news)
 
-    create_s3_object(BUCKET_NAME, OBJECT_NAME, json_news)
+    with metrics.stage("S3PutTime"):
+        create_s3_object(BUCKET_NAME, update["feed"]["output"], json_news)
+    metrics.add("OutputBytes", len(json_news), 'Bytes')
+
+    if OUTPUT_RASTER:
+        with metrics.stage("RasterTime"):
+            pages = rasterize_pages(news)
+        with metrics.stage("S3PutTime"):
+            create_s3_object(BUCKET_NAME, get_related_output_name(update["feed"]["output"], '.pages'), pages)
+        metrics.add("RasterBytes", len(pages), 'Bytes')
+
+    if OUTPUT_BINARY:
+        packed_news = pack_news(news)
+        with metrics.stage("S3PutTime"):
+            create_s3_object(BUCKET_NAME, get_related_output_name(update["feed"]["output"], '.bin'), packed_news)
+        metrics.add("BinaryBytes", len(packed_news), 'Bytes')
+
+    return json_news
+
+
+# Index of the output objects when there is more than one feed
+def write_index(feeds, feed_state):
+    index = {"feeds": []}
+    for feed in feeds:
+        state = feed_state.get(feed["link"], {})
+        index["feeds"].append({
+            "title": state.get("title", ""),
+            "link": feed["link"],
+            "output": feed["output"]
+        })
+    json_index = json.dumps(index)
+    create_s3_object(BUCKET_NAME, INDEX_FILE, json_index)
+    return json_index
+
+
+def lambda_handler(event, context):
+    metrics = Metrics(METRICS_NAMESPACE, METRICS)
+    try:
+        with metrics.stage("RunTime"):
+            return process_feeds(event, context, metrics)
+    finally:
+        metrics.emit()
+
+
+def process_feeds(event, context, metrics):
+    force = isinstance(event, dict) and event.get('force', False)
+    check_profiles()
+    feeds = load_feeds()
+    feed_state = {} if force else load_feed_state()
+    loaded_state = json.dumps(feed_state)
+    deadline = get_deadline(context)
+
+    # Parse the feeds concurrently
+    def check(feed):
+        try:
+            return check_feed(feed, feed_state.get(feed["link"], {}), force, metrics)
+        except Exception as e:  # One failing feed must not stop the others
+            if len(feeds) == 1:
+                raise
+            print(f"Skipping feed {feed['link']}: {e!r}")
+            return feed_state.get(feed["link"], {}), None
+
+    with ThreadPoolExecutor(max_workers=min(len(feeds), MAX_WORKERS)) as executor:
+        checked = list(executor.map(check, feeds))
+
+    updates = []
+    for feed, (state, update) in zip(feeds, checked):
+        feed_state[feed["link"]] = state
+        if update is not None:
+            updates.append(update)
+
+    metrics.add("Feeds", len(feeds))
+    metrics.add("UpdatedFeeds", len(updates))
+
+    if not updates:
+        if json.dumps(feed_state) != loaded_state:  # New ETag or Last-Modified
+            save_feed_state(feed_state)
+        return {'statusCode': 304, 'body': ''}
+
+    new_entries = [e for update in updates for e in update["new_entries"]]
+    summarized = summarize_entries(new_entries, deadline=deadline)
+    metrics.add("NewEntries", len(new_entries))
+    metrics.add("SummarizedEntries", len(summarized))
+
+    summary_cache.save()
+
+    archive_entries = []
+    written = 0
+    for update in updates:
+        news = make_feed_news(update, summarized)
+        state = feed_state[update["feed"]["link"]]
+        if len(news["entries"]) == len(update["entries"]):
+            state["entries_digest"] = update["entries_digest"]
+        else:  # Retry the missing entries next time
+            state["etag"] = state["modified"] = None
+        if not is_publishable(news, state):
+            print(f"Keeping the previous news, {len(news['entries'])} of {len(update['entries'])} entries: "
+                  f"{update['feed']['link']}")
+            continue
+        json_news = write_feed_news(update, news, metrics)
+        state["settings_digest"] = get_settings_digest()
+        state["published_entries"] = len(news["entries"])
+        written += 1
+        archive_entries += [dict(e, feed=update["feed"]["link"]) for e in news["entries"]]
+    metrics.add("KeptFeeds", len(updates) - written)
+
+    save_feed_state(feed_state)
+
+    if not written:
+        raise RuntimeError(f"Too few entries summarized ({len(summarized)} of {len(new_entries)}), "
+                           "the previous news is kept")
+
+    if ARCHIVE:
+        with metrics.stage("ArchiveTime"):
+            metrics.add("ArchivedEntries", archive.append(archive_entries))
+
+    if len(feeds) > 1:
+        json_news = write_index(feeds, feed_state)
 
     return {
         'statusCode': 200,
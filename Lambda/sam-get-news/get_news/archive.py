@@ -0,0 +1,116 @@
+import gzip
+import json
+import time
+import uuid
+import bisect
+import struct
+import hashlib
+
+
+# History of the summarized entries, next to the news that each run overwrites:
+#
+#   archive/date=2024-05-01/120000-1a2b3c4d.jsonl.gz  entries archived by a run
+#   archive/links.idx                                 sorted link index
+#
+# The partitions are never rewritten, each run adds its own object, so readers
+# can fetch only the dates they need. The index has a fixed-size record for
+# each link: a hash of the link, a hash of its summary, and the day it was
+# archived, sorted by link hash for a binary search.
+
+DAY = 24 * 3600
+
+
+def link_hash(link):
+    return hashlib.sha256(link.encode()).digest()[:8]
+
+
+def summary_hash(summary):
+    return hashlib.sha256(summary.encode()).digest()[:4]
+
+
+class LinkIndex:
+    MAGIC = b'LNK1'
+    HEADER = struct.Struct('>4sI')
+    RECORD = struct.Struct('>8s4sI')  # Link hash, summary hash, day
+
+    def __init__(self, content=None):
+        if content:
+            magic, count = self.HEADER.unpack_from(content)
+            if magic != self.MAGIC:
+                raise ValueError('Not a link index')
+            self.records = memoryview(content)[self.HEADER.size:self.HEADER.size + count * self.RECORD.size]
+        else:
+            self.records = memoryview(b'')
+
+    def __len__(self):
+        return len(self.records) // self.RECORD.size
+
+    # The link hash of a record, so that bisect can search the index directly
+    def __getitem__(self, i):
+        offset = i * self.RECORD.size
+        return bytes(self.records[offset:offset + 8])
+
+    def find(self, link):
+        key = link_hash(link)
+        i = bisect.bisect_left(self, key)
+        if i < len(self) and self[i] == key:
+            return self.RECORD.unpack_from(self.records, i * self.RECORD.size)
+        return None
+
+    def items(self):
+        return self.RECORD.iter_unpack(self.records)
+
+    # The content of a new index with the records added, or replacing the
+    # records of the same links: the existing records between them are
+    # copied as they are, with no need to unpack them
+    def merge(self, records):
+        size = self.RECORD.size
+        parts = []
+        count = len(self)
+        start = 0
+        for record in sorted(records):
+            i = bisect.bisect_left(self, record[0], start)
+            parts.append(self.records[start * size:i * size])
+            parts.append(self.RECORD.pack(*record))
+            if i < len(self) and self[i] == record[0]:
+                i += 1
+            else:
+                count += 1
+            start = i
+        parts.append(self.records[start * size:])
+        return self.HEADER.pack(self.MAGIC, count) + b''.join(parts)
+
+
+class EditionArchive:
+    def __init__(self, storage, prefix='archive/'):
+        self.storage = storage
+        self.prefix = prefix
+        self.index_key = prefix + 'links.idx'
+
+    def load_index(self):
+        return LinkIndex(self.storage.get(self.index_key))
+
+    def partition_key(self, now):
+        day = time.strftime('%Y-%m-%d', time.gmtime(now))
+        return f"{self.prefix}date={day}/{time.strftime('%H%M%S', time.gmtime(now))}-{uuid.uuid4().hex[:8]}.jsonl.gz"
+
+    # Add the entries that are new, or have a new summary, to today's
+    # partition, and update the index. Returns the number of entries added
+    def append(self, entries, now=None):
+        now = time.time() if now is None else now
+        day = int(now // DAY)
+        index = self.load_index()
+        records = {}  # New records of this run
+        lines = []
+        for e in entries:
+            key, digest = link_hash(e["link"]), summary_hash(e["summary"])
+            record = records.get(key) or index.find(e["link"])
+            if record is not None and record[1] == digest:
+                continue
+            records[key] = (key, digest, day)
+            lines.append(json.dumps(dict(e, archived=int(now))))
+        if not lines:
+            return 0
+        self.storage.put(self.partition_key(now), gzip.compress(('\n'.join(lines) + '\n').encode()))
+        self.storage.put(self.index_key, index.merge(records.values()))
+        return len(lines)
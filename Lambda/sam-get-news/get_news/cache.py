@@ -0,0 +1,66 @@
+import json
+import time
+import hashlib
+import threading
+
+
+# Summaries from previous runs, so that only new or changed articles invoke the model
+
+class SummaryCache:
+    def __init__(self, storage, key, max_age_days=30, max_entries=500):
+        self.storage = storage
+        self.key = key
+        self.max_age = max_age_days * 24 * 3600
+        self.max_entries = max_entries
+        self.lock = threading.Lock()
+        self.items = None
+        self.changed = False
+
+    # The link plus a hash of everything that changes the summary
+    @staticmethod
+    def make_key(link, *parts):
+        digest = hashlib.sha256()
+        for part in parts:
+            digest.update(part.encode())
+            digest.update(b'\0')
+        return link + '#' + digest.hexdigest()
+
+    def load(self):
+        content = self.storage.get(self.key)
+        self.items = json.loads(content) if content else {}
+        self.changed = False
+
+    def get(self, key):
+        with self.lock:
+            if self.items is None:
+                self.load()
+            item = self.items.get(key)
+            if item is None:
+                return None
+            item['time'] = time.time()  # Keep what is still in the feed
+            self.changed = True
+            return item['summary']
+
+    def put(self, key, summary):
+        with self.lock:
+            if self.items is None:
+                self.load()
+            self.items[key] = {'summary': summary, 'time': time.time()}
+            self.changed = True
+
+    # Drop entries not used for a while, then the oldest ones above the limit
+    def evict(self):
+        oldest = time.time() - self.max_age
+        items = sorted(
+            ((k, v) for k, v in self.items.items() if v['time'] >= oldest),
+            key=lambda kv: kv[1]['time'], reverse=True
+        )
+        self.items = dict(items[:self.max_entries])
+
+    def save(self):
+        with self.lock:
+            if self.items is None or not self.changed:
+                return
+            self.evict()
+            self.storage.put(self.key, json.dumps(self.items))
+            self.changed = False
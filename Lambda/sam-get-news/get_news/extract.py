@@ -0,0 +1,117 @@
+import re
+import codecs
+from html.parser import HTMLParser
+
+
+# Content that is not part of the article
+SKIP_TAGS = {'script', 'style', 'nav', 'footer', 'noscript', 'template', 'svg'}
+
+# Tags that start a new line of text
+BLOCK_TAGS = {
+    'address', 'article', 'aside', 'blockquote', 'br', 'dd', 'div', 'dl', 'dt',
+    'figcaption', 'figure', 'form', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'header',
+    'hr', 'li', 'main', 'ol', 'p', 'pre', 'section', 'table', 'td', 'th', 'title',
+    'tr', 'ul'
+}
+
+
+# <meta charset="..."> or <meta http-equiv="Content-Type" content="...; charset=...">
+META_CHARSET = re.compile(rb'<meta[^>]+charset\s*=\s*["\']?\s*([A-Za-z0-9_.:-]+)', re.IGNORECASE)
+
+BOMS = [(codecs.BOM_UTF8, 'utf-8-sig'), (codecs.BOM_UTF16_LE, 'utf-16'), (codecs.BOM_UTF16_BE, 'utf-16')]
+
+
+def is_known_encoding(encoding):
+    try:
+        codecs.lookup(encoding)
+        return True
+    except LookupError:
+        return False
+
+
+# Encoding of a page without a charset in the headers, from the first block:
+# a byte order mark, a meta charset, or UTF-8 when it decodes, Windows-1252
+# otherwise (like BeautifulSoup did)
+def sniff_encoding(block):
+    for bom, encoding in BOMS:
+        if block.startswith(bom):
+            return encoding
+    match = META_CHARSET.search(block)
+    if match:
+        encoding = match.group(1).decode('ascii')
+        if is_known_encoding(encoding):
+            return encoding
+    try:
+        block.decode('utf-8')
+    except UnicodeDecodeError as e:
+        if e.start < len(block) - 3:  # Not just a character cut at the end of the block
+            return 'windows-1252'
+    return 'utf-8'
+
+
+# Extract the text of an HTML page in a single pass, without building a tree,
+# and stop when enough text has been collected
+
+class TextExtractor(HTMLParser):
+    def __init__(self, max_chars=None):
+        super().__init__(convert_charrefs=True)
+        self.max_chars = max_chars
+        self.skip_depth = 0
+        self.chunks = []
+        self.size = 0
+        self.done = False
+
+    def handle_starttag(self, tag, attrs):
+        if tag in SKIP_TAGS:
+            self.skip_depth += 1
+        elif tag in BLOCK_TAGS:
+            self.chunks.append('\n')
+
+    def handle_startendtag(self, tag, attrs):
+        if tag in BLOCK_TAGS:
+            self.chunks.append('\n')
+
+    def handle_endtag(self, tag):
+        if tag in SKIP_TAGS:
+            if self.skip_depth > 0:
+                self.skip_depth -= 1
+        elif tag in BLOCK_TAGS:
+            self.chunks.append('\n')
+
+    def handle_data(self, data):
+        if self.skip_depth > 0 or self.done:
+            return
+        self.chunks.append(data)
+        self.size += len(data)
+        if self.max_chars is not None and self.size >= self.max_chars:
+            self.done = True
+
+    # Same normalization as before: one phrase per line, no blank lines
+    def get_text(self):
+        text = ''.join(self.chunks)
+        lines = (line.strip() for line in text.splitlines())
+        chunks = (phrase.strip() for line in lines for phrase in line.split("  "))
+        text = '\n'.join(chunk for chunk in chunks if chunk)
+        if self.max_chars is not None:
+            text = text[:self.max_chars]
+        return text
+
+
+# Read a file-like object in blocks until the page ends or there's enough text,
+# the encoding is the charset in the headers, if any
+def extract_text(stream, encoding=None, max_chars=None, block_size=64 * 1024):
+    block = stream.read(block_size)
+    if not encoding or not is_known_encoding(encoding):
+        encoding = sniff_encoding(block)
+    decoder = codecs.getincrementaldecoder(encoding)(errors='replace')
+    extractor = TextExtractor(max_chars)
+    while not extractor.done:
+        if block is None:
+            block = stream.read(block_size)
+        if not block:
+            extractor.feed(decoder.decode(b'', final=True))
+            break
+        extractor.feed(decoder.decode(block))
+        block = None
+    extractor.close()
+    return extractor.get_text()
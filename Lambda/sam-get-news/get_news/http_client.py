@@ -0,0 +1,172 @@
+import zlib
+import threading
+import http.client
+from urllib.parse import urlsplit, urljoin
+
+USER_AGENT = 'Mozilla/5.0 (compatible; get-the-news)'
+REDIRECTS = {301, 302, 303, 307, 308}
+
+
+class HTTPStatusError(Exception):
+    def __init__(self, url, status, reason):
+        super().__init__(f'HTTP {status} {reason}: {url}')
+        self.url = url
+        self.status = status
+
+
+# Response body decompressed while it is read
+
+class DecodedResponse:
+    def __init__(self, response, url):
+        self.response = response
+        self.url = url
+        self.status = response.status
+        self.headers = {k.lower(): v for k, v in response.getheaders()}
+        self.encoding = response.msg.get_content_charset()
+        content_encoding = self.headers.get('content-encoding', '').lower()
+        if content_encoding in ('gzip', 'x-gzip'):
+            self.decoder = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        elif content_encoding == 'deflate':
+            self.decoder = zlib.decompressobj()
+        else:
+            self.decoder = None
+        self.first_block = True
+        self.pending = b''
+
+    # At most max_length bytes (0 for no limit), the input left over is kept
+    # in the decoder's unconsumed_tail
+    def decode(self, data, max_length=0):
+        if self.first_block and self.headers.get('content-encoding', '').lower() == 'deflate':
+            self.first_block = False
+            try:
+                return self.decoder.decompress(data, max_length)
+            except zlib.error:  # Raw deflate without the zlib header
+                self.decoder = zlib.decompressobj(-zlib.MAX_WBITS)
+        return self.decoder.decompress(data, max_length)
+
+    def read(self, size=-1):
+        if self.decoder is None:
+            return self.response.read() if size < 0 else self.response.read(size)
+        if size < 0:
+            data = self.pending + self.decode(self.decoder.unconsumed_tail + self.response.read()) + self.decoder.flush()
+            self.pending = b''
+            return data
+        # Decompress no more than asked for, so that a highly compressed
+        # block doesn't expand in memory all at once
+        while len(self.pending) < size:
+            data = self.decoder.unconsumed_tail or self.response.read(size)
+            if not data:
+                self.pending += self.decoder.flush()
+                break
+            self.pending += self.decode(data, size - len(self.pending))
+        data, self.pending = self.pending[:size], self.pending[size:]
+        return data
+
+    @property
+    def complete(self):
+        unconsumed = self.decoder is not None and self.decoder.unconsumed_tail
+        return self.response.isclosed() and not self.pending and not unconsumed
+
+
+# HTTP client with keep-alive connections reused per host, transparent
+# gzip/deflate decompression, and separate connect and read timeouts
+
+class HTTPClient:
+    def __init__(self, connect_timeout=5.0, read_timeout=10.0, max_idle_per_host=4, max_redirects=5):
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.max_idle_per_host = max_idle_per_host
+        self.max_redirects = max_redirects
+        self.idle = {}  # (scheme, host, port) -> idle connections
+        self.lock = threading.Lock()
+
+    def connect(self, key):
+        scheme, host, port = key
+        if scheme == 'https':
+            connection = http.client.HTTPSConnection(host, port, timeout=self.connect_timeout)
+        else:
+            connection = http.client.HTTPConnection(host, port, timeout=self.connect_timeout)
+        connection.connect()
+        connection.sock.settimeout(self.read_timeout)
+        return connection
+
+    def release(self, key, connection):
+        with self.lock:
+            connections = self.idle.setdefault(key, [])
+            if len(connections) < self.max_idle_per_host:
+                connections.append(connection)
+                return
+        connection.close()
+
+    def request(self, key, path, headers):
+        with self.lock:
+            connections = self.idle.get(key)
+            connection = connections.pop() if connections else None
+        if connection is not None:
+            try:
+                connection.request('GET', path, headers=headers)
+                return connection, connection.getresponse()
+            except (http.client.RemoteDisconnected, ConnectionError):
+                connection.close()  # The server closed the idle connection
+        connection = self.connect(key)
+        connection.request('GET', path, headers=headers)
+        return connection, connection.getresponse()
+
+    def open(self, url, headers=None):
+        for _ in range(self.max_redirects + 1):
+            parts = urlsplit(url)
+            scheme = parts.scheme.lower()
+            key = (scheme, parts.hostname, parts.port or (443 if scheme == 'https' else 80))
+            path = (parts.path or '/') + ('?' + parts.query if parts.query else '')
+            request_headers = {
+                'Host': parts.netloc,
+                'User-Agent': USER_AGENT,
+                'Accept-Encoding': 'gzip, deflate',
+                'Connection': 'keep-alive'
+            }
+            request_headers.update(headers or {})
+            connection, response = self.request(key, path, request_headers)
+            if response.status in REDIRECTS and response.getheader('Location'):
+                response.read()
+                self.done(key, connection, response)
+                url = urljoin(url, response.getheader('Location'))
+                continue
+            return key, connection, DecodedResponse(response, url)
+        raise HTTPStatusError(url, response.status, 'Too many redirects')
+
+    # Return the connection to the pool if the response was read completely
+    def done(self, key, connection, response):
+        if response.isclosed() and not response.will_close:
+            self.release(key, connection)
+        else:
+            connection.close()
+
+    # Read the response incrementally, as a file-like object
+    def stream(self, url, headers=None):
+        return Stream(self, url, headers)
+
+    # Read the whole response, 304 is returned as a status with an empty body
+    def get(self, url, headers=None):
+        with self.stream(url, headers) as response:
+            response.body = response.read()
+            return response
+
+
+class Stream:
+    def __init__(self, client, url, headers):
+        self.client = client
+        self.url = url
+        self.headers = headers
+
+    def __enter__(self):
+        self.key, self.connection, self.response = self.client.open(self.url, self.headers)
+        if self.response.status >= 400:
+            self.connection.close()
+            raise HTTPStatusError(self.response.url, self.response.status, self.response.response.reason)
+        return self.response
+
+    def __exit__(self, *exc_info):
+        if self.response.complete:
+            self.client.done(self.key, self.connection, self.response.response)
+        else:  # Stopped reading before the end
+            self.connection.close()
@@ -0,0 +1,65 @@
+import json
+import time
+import threading
+from contextlib import contextmanager
+
+
+# Metrics of an entry or of a run, printed as a CloudWatch Embedded Metric
+# Format (EMF) record: CloudWatch Logs extracts the metrics without API calls
+
+class Metrics:
+    def __init__(self, namespace, enabled=True, **properties):
+        self.namespace = namespace
+        self.enabled = enabled
+        self.properties = properties  # Searchable in the logs, not dimensions
+        self.values = {}
+        self.units = {}
+        self.lock = threading.Lock()
+
+    # Values with the same name are added, for example the time of all model calls
+    def add(self, name, value, unit='Count'):
+        with self.lock:
+            self.values[name] = self.values.get(name, 0) + value
+            self.units[name] = unit
+
+    @contextmanager
+    def stage(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, (time.perf_counter() - start) * 1000, 'Milliseconds')
+
+    def emit(self):
+        if not self.enabled or not self.values:
+            return
+        record = {
+            "_aws": {
+                "Timestamp": int(time.time() * 1000),
+                "CloudWatchMetrics": [{
+                    "Namespace": self.namespace,
+                    "Dimensions": [[]],
+                    "Metrics": [{"Name": name, "Unit": unit} for name, unit in self.units.items()]
+                }]
+            }
+        }
+        record.update(self.properties)
+        record.update(self.values)
+        print(json.dumps(record))
+
+
+# Time spent reading from a stream and bytes read, to separate the download
+# from the processing of what is read
+
+class TimedReader:
+    def __init__(self, stream):
+        self.stream = stream
+        self.seconds = 0.0
+        self.bytes = 0
+
+    def read(self, size=-1):
+        start = time.perf_counter()
+        data = self.stream.read(size)
+        self.seconds += time.perf_counter() - start
+        self.bytes += len(data)
+        return data
@@ -0,0 +1,42 @@
+# Compact binary encoding of the news for small devices: a header with the
+# number of entries, then the title of the news and the title, link, and
+# summary of each entry. Each field is UTF-8 with a 16-bit length before it,
+# so a decoder can read one field at a time into a fixed buffer.
+
+import struct
+
+MAGIC = b'NWS1'
+HEADER = struct.Struct('>4sH')
+FIELD_SIZE = struct.Struct('>H')
+MAX_FIELD_BYTES = 1024  # Size of the buffer of the decoder on the device
+
+
+# Longer fields are cut on a character boundary
+def pack_field(text):
+    data = text.encode('utf-8')[:MAX_FIELD_BYTES].decode('utf-8', 'ignore').encode('utf-8')
+    return FIELD_SIZE.pack(len(data)) + data
+
+
+def pack_news(news):
+    parts = [HEADER.pack(MAGIC, len(news['entries'])), pack_field(news['title'])]
+    for e in news['entries']:
+        parts += [pack_field(e['title']), pack_field(e['link']), pack_field(e['summary'])]
+    return b''.join(parts)
+
+
+def unpack_news(data):
+    magic, count = HEADER.unpack_from(data)
+    if magic != MAGIC:
+        raise ValueError('Not a packed news object')
+    offset = HEADER.size
+
+    def field():
+        nonlocal offset
+        size, = FIELD_SIZE.unpack_from(data, offset)
+        offset += FIELD_SIZE.size + size
+        return data[offset - size:offset].decode('utf-8')
+
+    news = {'title': field(), 'entries': []}
+    for _ in range(count):
+        news['entries'].append({'title': field(), 'link': field(), 'summary': field()})
+    return news
@@ -0,0 +1,155 @@
+# Pages rasterized server-side in the 1-bit layout of the e-paper framebuffer,
+# so the device can read them straight into its buffer and send them
+
+import struct
+
+from render import PROFILES, render_page
+
+# EPD_2in13_V3_Landscape: framebuf.MONO_VLSB, 250 pixels wide and 122 high,
+# rounded up to 128 so that each byte is a column of 8 pixels, least
+# significant bit at the top, white when the bit is set
+WIDTH = 250
+HEIGHT = 128
+PAGE_SIZE = WIDTH * HEIGHT // 8
+PROFILE = 'epd_2in13_landscape'
+LINE_HEIGHT = 10  # Same as display_news on the device, first line at y = 10
+
+# Header of the pages object: magic, number of pages, bytes in each page
+MAGIC = b'EPDP'
+HEADER = struct.Struct('>4sHH')
+
+# Fixed-width 8x8 font for the printable ASCII characters, one byte for each
+# column with the least significant bit at the top. The glyphs are the CP437
+# font of luma.core (MIT License, Copyright (c) 2017-2021 Richard Hull and
+# contributors).
+FONT = [
+    b'\x00\x00\x00\x00\x00\x00\x00\x00',  # ' '
+    b'\x00\x06\x5f\x5f\x06\x00\x00\x00',  # '!'
+    b'\x00\x07\x07\x00\x07\x07\x00\x00',  # '"'
+    b'\x14\x7f\x7f\x14\x7f\x7f\x14\x00',  # '#'
+    b'\x24\x2e\x6b\x6b\x3a\x12\x00\x00',  # '$'
+    b'\x46\x66\x30\x18\x0c\x66\x62\x00',  # '%'
+    b'\x30\x7a\x4f\x5d\x37\x7a\x48\x00',  # '&'
+    b'\x04\x07\x03\x00\x00\x00\x00\x00',  # "'"
+    b'\x00\x1c\x3e\x63\x41\x00\x00\x00',  # '('
+    b'\x00\x41\x63\x3e\x1c\x00\x00\x00',  # ')'
+    b'\x08\x2a\x3e\x1c\x1c\x3e\x2a\x08',  # '*'
+    b'\x08\x08\x3e\x3e\x08\x08\x00\x00',  # '+'
+    b'\x00\x80\xe0\x60\x00\x00\x00\x00',  # ','
+    b'\x08\x08\x08\x08\x08\x08\x00\x00',  # '-'
+    b'\x00\x00\x60\x60\x00\x00\x00\x00',  # '.'
+    b'\x60\x30\x18\x0c\x06\x03\x01\x00',  # '/'
+    b'\x3e\x7f\x71\x59\x4d\x7f\x3e\x00',  # '0'
+    b'\x40\x42\x7f\x7f\x40\x40\x00\x00',  # '1'
+    b'\x62\x73\x59\x49\x6f\x66\x00\x00',  # '2'
+    b'\x22\x63\x49\x49\x7f\x36\x00\x00',  # '3'
+    b'\x18\x1c\x16\x53\x7f\x7f\x50\x00',  # '4'
+    b'\x27\x67\x45\x45\x7d\x39\x00\x00',  # '5'
+    b'\x3c\x7e\x4b\x49\x79\x30\x00\x00',  # '6'
+    b'\x03\x03\x71\x79\x0f\x07\x00\x00',  # '7'
+    b'\x36\x7f\x49\x49\x7f\x36\x00\x00',  # '8'
+    b'\x06\x4f\x49\x69\x3f\x1e\x00\x00',  # '9'
+    b'\x00\x00\x66\x66\x00\x00\x00\x00',  # ':'
+    b'\x00\x80\xe6\x66\x00\x00\x00\x00',  # ';'
+    b'\x08\x1c\x36\x63\x41\x00\x00\x00',  # '<'
+    b'\x24\x24\x24\x24\x24\x24\x00\x00',  # '='
+    b'\x00\x41\x63\x36\x1c\x08\x00\x00',  # '>'
+    b'\x02\x03\x51\x59\x0f\x06\x00\x00',  # '?'
+    b'\x3e\x7f\x41\x5d\x5d\x1f\x1e\x00',  # '@'
+    b'\x7c\x7e\x13\x13\x7e\x7c\x00\x00',  # 'A'
+    b'\x41\x7f\x7f\x49\x49\x7f\x36\x00',  # 'B'
+    b'\x1c\x3e\x63\x41\x41\x63\x22\x00',  # 'C'
+    b'\x41\x7f\x7f\x41\x63\x3e\x1c\x00',  # 'D'
+    b'\x41\x7f\x7f\x49\x5d\x41\x63\x00',  # 'E'
+    b'\x41\x7f\x7f\x49\x1d\x01\x03\x00',  # 'F'
+    b'\x1c\x3e\x63\x41\x51\x73\x72\x00',  # 'G'
+    b'\x7f\x7f\x08\x08\x7f\x7f\x00\x00',  # 'H'
+    b'\x00\x41\x7f\x7f\x41\x00\x00\x00',  # 'I'
+    b'\x30\x70\x40\x41\x7f\x3f\x01\x00',  # 'J'
+    b'\x41\x7f\x7f\x08\x1c\x77\x63\x00',  # 'K'
+    b'\x41\x7f\x7f\x41\x40\x60\x70\x00',  # 'L'
+    b'\x7f\x7f\x0e\x1c\x0e\x7f\x7f\x00',  # 'M'
+    b'\x7f\x7f\x06\x0c\x18\x7f\x7f\x00',  # 'N'
+    b'\x1c\x3e\x63\x41\x63\x3e\x1c\x00',  # 'O'
+    b'\x41\x7f\x7f\x49\x09\x0f\x06\x00',  # 'P'
+    b'\x1e\x3f\x21\x71\x7f\x5e\x00\x00',  # 'Q'
+    b'\x41\x7f\x7f\x09\x19\x7f\x66\x00',  # 'R'
+    b'\x26\x6f\x4d\x59\x73\x32\x00\x00',  # 'S'
+    b'\x03\x41\x7f\x7f\x41\x03\x00\x00',  # 'T'
+    b'\x7f\x7f\x40\x40\x7f\x7f\x00\x00',  # 'U'
+    b'\x1f\x3f\x60\x60\x3f\x1f\x00\x00',  # 'V'
+    b'\x7f\x7f\x30\x18\x30\x7f\x7f\x00',  # 'W'
+    b'\x43\x67\x3c\x18\x3c\x67\x43\x00',  # 'X'
+    b'\x07\x4f\x78\x78\x4f\x07\x00\x00',  # 'Y'
+    b'\x47\x63\x71\x59\x4d\x67\x73\x00',  # 'Z'
+    b'\x00\x7f\x7f\x41\x41\x00\x00\x00',  # '['
+    b'\x01\x03\x06\x0c\x18\x30\x60\x00',  # '\\'
+    b'\x00\x41\x41\x7f\x7f\x00\x00\x00',  # ']'
+    b'\x08\x0c\x06\x03\x06\x0c\x08\x00',  # '^'
+    b'\x80\x80\x80\x80\x80\x80\x80\x80',  # '_'
+    b'\x00\x00\x03\x07\x04\x00\x00\x00',  # '`'
+    b'\x20\x74\x54\x54\x3c\x78\x40\x00',  # 'a'
+    b'\x41\x7f\x3f\x48\x48\x78\x30\x00',  # 'b'
+    b'\x38\x7c\x44\x44\x6c\x28\x00\x00',  # 'c'
+    b'\x30\x78\x48\x49\x3f\x7f\x40\x00',  # 'd'
+    b'\x38\x7c\x54\x54\x5c\x18\x00\x00',  # 'e'
+    b'\x48\x7e\x7f\x49\x03\x02\x00\x00',  # 'f'
+    b'\x98\xbc\xa4\xa4\xf8\x7c\x04\x00',  # 'g'
+    b'\x41\x7f\x7f\x08\x04\x7c\x78\x00',  # 'h'
+    b'\x00\x44\x7d\x7d\x40\x00\x00\x00',  # 'i'
+    b'\x60\xe0\x80\x80\xfd\x7d\x00\x00',  # 'j'
+    b'\x41\x7f\x7f\x10\x38\x6c\x44\x00',  # 'k'
+    b'\x00\x41\x7f\x7f\x40\x00\x00\x00',  # 'l'
+    b'\x7c\x7c\x18\x38\x1c\x7c\x78\x00',  # 'm'
+    b'\x7c\x7c\x04\x04\x7c\x78\x00\x00',  # 'n'
+    b'\x38\x7c\x44\x44\x7c\x38\x00\x00',  # 'o'
+    b'\x84\xfc\xf8\xa4\x24\x3c\x18\x00',  # 'p'
+    b'\x18\x3c\x24\xa4\xf8\xfc\x84\x00',  # 'q'
+    b'\x44\x7c\x78\x4c\x04\x1c\x18\x00',  # 'r'
+    b'\x48\x5c\x54\x54\x74\x24\x00\x00',  # 's'
+    b'\x00\x04\x3e\x7f\x44\x24\x00\x00',  # 't'
+    b'\x3c\x7c\x40\x40\x3c\x7c\x40\x00',  # 'u'
+    b'\x1c\x3c\x60\x60\x3c\x1c\x00\x00',  # 'v'
+    b'\x3c\x7c\x70\x38\x70\x7c\x3c\x00',  # 'w'
+    b'\x44\x6c\x38\x10\x38\x6c\x44\x00',  # 'x'
+    b'\x9c\xbc\xa0\xa0\xfc\x7c\x00\x00',  # 'y'
+    b'\x4c\x64\x74\x5c\x4c\x64\x00\x00',  # 'z'
+    b'\x08\x08\x3e\x77\x41\x41\x00\x00',  # '{'
+    b'\x00\x00\x00\x77\x77\x00\x00\x00',  # '|'
+    b'\x41\x41\x77\x3e\x08\x08\x00\x00',  # '}'
+    b'\x02\x03\x01\x03\x02\x03\x01\x00',  # '~'
+]
+
+# Typographic characters frequent in the summaries
+REPLACEMENTS = str.maketrans({
+    '\u2018': "'", '\u2019': "'", '\u201c': '"', '\u201d': '"',
+    '\u2013': '-', '\u2014': '-', '\u2026': '...', '\u00a0': ' ',
+})
+
+
+def draw_text(page, text, x, y):
+    for c in text.translate(REPLACEMENTS):
+        if x >= WIDTH:
+            break
+        code = ord(c)
+        glyph = FONT[code - 32] if 32 <= code < 127 else FONT[ord('?') - 32]
+        for column in glyph:
+            if column and 0 <= x < WIDTH:
+                for row in range(8):
+                    if column >> row & 1 and 0 <= y + row < HEIGHT:
+                        page[(y + row) // 8 * WIDTH + x] &= ~(1 << ((y + row) & 7))
+            x += 1
+
+
+def rasterize_page(lines):
+    page = bytearray(b'\xff' * PAGE_SIZE)
+    for i, line in enumerate(lines):
+        draw_text(page, line, 0, LINE_HEIGHT * (i + 1))
+    return page
+
+
+# The title of the news, then one page for each entry
+def rasterize_pages(news):
+    texts = [news['title']] + [e['summary'] for e in news['entries']]
+    pages = [rasterize_page(render_page(text, PROFILES[PROFILE])) for text in texts]
+    return HEADER.pack(MAGIC, len(pages), PAGE_SIZE) + b''.join(pages)
@@ -0,0 +1,102 @@
+import time
+import random
+import threading
+
+THROTTLING_ERRORS = {
+    'ThrottlingException', 'TooManyRequestsException', 'ServiceUnavailableException',
+    'throttlingException'  # In a response stream
+}
+
+# Retried with the same backoff, without slowing down: botocore doesn't retry
+# model invocations, so that throttling goes through the limiter
+TRANSIENT_ERRORS = {
+    'InternalServerException', 'ModelTimeoutException', 'ModelNotReadyException',
+    'internalServerException', 'modelTimeoutException', 'modelStreamErrorException'
+}
+
+# Timeouts and dropped connections, botocore exceptions matched by name
+CONNECTION_ERRORS = {'HTTPClientError', 'ConnectionError', 'TimeoutError'}
+
+
+def get_error_code(e):  # botocore ClientError, without importing botocore
+    response = getattr(e, 'response', None)
+    return response.get('Error', {}).get('Code') if isinstance(response, dict) else None
+
+
+def is_transient(e):
+    return get_error_code(e) in TRANSIENT_ERRORS or any(c.__name__ in CONNECTION_ERRORS for c in type(e).__mro__)
+
+
+# Client-side token bucket for model invocations. The rate shrinks when the
+# service throttles and grows back on success (AIMD), so that requests stay
+# close to the allowed rate instead of piling up on retries. The rate of the
+# last throttle is kept as a ceiling: the rate grows back fast up to near the
+# ceiling, and then only probes slowly for more.
+
+class AdaptiveRateLimiter:
+    def __init__(self, rate=1.0, max_rate=10.0, min_rate=0.1, increase=0.25, decrease=0.7,
+                 near_ceiling=0.9, probe_increase=0.005, max_retries=8, base_delay=0.5, max_delay=20.0):
+        self.rate = rate  # Requests per second
+        self.max_rate = max_rate
+        self.min_rate = min_rate
+        self.increase = increase
+        self.decrease = decrease
+        self.ceiling = None  # Rate of the last throttle
+        self.near_ceiling = near_ceiling
+        self.probe_increase = probe_increase
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.tokens = 1.0
+        self.last_refill = time.monotonic()
+        self.last_decrease = 0.0
+        self.lock = threading.Lock()
+
+    def refill(self, now):
+        self.tokens = min(1.0, self.tokens + (now - self.last_refill) * self.rate)
+        self.last_refill = now
+
+    # Block until a request can be sent
+    def acquire(self):
+        while True:
+            with self.lock:
+                self.refill(time.monotonic())
+                if self.tokens >= 1.0:
+                    self.tokens -= 1.0
+                    return
+                wait = (1.0 - self.tokens) / self.rate
+            time.sleep(wait)
+
+    def on_success(self):
+        with self.lock:
+            near = self.ceiling is not None and self.rate >= self.near_ceiling * self.ceiling
+            self.rate = min(self.max_rate, self.rate + (self.probe_increase if near else self.increase))
+
+    def on_throttle(self):
+        with self.lock:
+            now = time.monotonic()
+            # Concurrent requests are throttled together, decrease only once for them
+            if now - self.last_decrease >= 1.0 / self.rate:
+                self.ceiling = self.rate
+                self.rate = max(self.min_rate, self.rate * self.decrease)
+                self.last_decrease = now
+
+    # Full jitter exponential backoff
+    def backoff(self, attempt):
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+
+    def call(self, function, *args, **kwargs):
+        for attempt in range(self.max_retries + 1):
+            self.acquire()
+            try:
+                result = function(*args, **kwargs)
+            except Exception as e:
+                throttled = get_error_code(e) in THROTTLING_ERRORS
+                if not (throttled or is_transient(e)) or attempt == self.max_retries:
+                    raise
+                if throttled:
+                    self.on_throttle()
+                time.sleep(self.backoff(attempt))
+            else:
+                self.on_success()
+                return result
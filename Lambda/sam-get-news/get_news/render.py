@@ -0,0 +1,66 @@
+# Output profiles for devices: text fitted, wrapped and centered server-side
+# into ready-to-draw lines, so the device doesn't need to split strings
+
+PROFILES = {
+    # Waveshare Pico-ePaper-2.13 in landscape mode, 8x8 font with 10 pixel lines,
+    # the margin leaves a free cell on each side. The first line is drawn at
+    # y = 10, so only 11 lines fit in the 122 pixels of the panel
+    'epd_2in13_landscape': {'width': 32, 'height': 11, 'margin': 1},
+    'epd_2in13_portrait': {'width': 16, 'height': 24, 'margin': 1},
+}
+
+
+def wrap_words(text, width):
+    lines = []
+    for paragraph in text.splitlines():
+        line = ''
+        for word in paragraph.split():
+            while len(word) > width:  # Longer than a line
+                if line:
+                    lines.append(line)
+                    line = ''
+                lines.append(word[:width])
+                word = word[width:]
+            if line and len(line) + 1 + len(word) > width:
+                lines.append(line)
+                line = ''
+            line = line + ' ' + word if line else word
+        if line:
+            lines.append(line)
+    return lines
+
+
+# Drop the last sentences until the text fits, truncate as a last resort
+def fit_lines(text, width, height):
+    lines = wrap_words(text, width)
+    while len(lines) > height:
+        cut = text.rstrip('.').rfind('. ')
+        if cut <= 0:
+            lines = lines[:height]
+            lines[-1] = lines[-1][:width - 3].rstrip() + '...'
+            break
+        text = text[:cut + 1]
+        lines = wrap_words(text, width)
+    return lines
+
+
+# Center the lines in the width and height of the display
+def center_lines(lines, width, height):
+    lines = [' ' * ((width - len(line)) // 2) + line for line in lines]
+    return [''] * ((height - len(lines)) // 2) + lines
+
+
+def render_page(text, profile):
+    width, height = profile['width'], profile['height']
+    lines = fit_lines(text, width - 2 * profile['margin'], height)
+    return center_lines(lines, width, height)
+
+
+# Pages for each profile: the title of the news, then one for each entry
+def render_pages(news, profile_names):
+    pages = {}
+    for name in profile_names:
+        profile = PROFILES[name]
+        texts = [news['title']] + [e['summary'] for e in news['entries']]
+        pages[name] = [render_page(text, profile) for text in texts]
+    return pages
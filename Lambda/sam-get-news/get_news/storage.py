@@ -0,0 +1,45 @@
+import os
+
+
+# Store small state objects (cache, feed state, ...) next to the news in S3,
+# get_client returns the S3 client when it is first needed
+
+class S3Storage:
+    def __init__(self, get_client, bucket_name):
+        self.get_client = get_client
+        self.bucket_name = bucket_name
+
+    def get(self, key):
+        from botocore.exceptions import ClientError
+        try:
+            return self.get_client().get_object(Bucket=self.bucket_name, Key=key)['Body'].read()
+        except ClientError as e:
+            if e.response['Error']['Code'] in ('NoSuchKey', '404'):
+                return None
+            raise
+
+    def put(self, key, content):
+        self.get_client().put_object(Bucket=self.bucket_name, Key=key, Body=content)
+
+
+# Same interface on a local directory, to run and test without S3
+
+class LocalStorage:
+    def __init__(self, path):
+        self.path = path
+        os.makedirs(path, exist_ok=True)
+
+    def get(self, key):
+        try:
+            with open(os.path.join(self.path, key), 'rb') as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    def put(self, key, content):
+        if isinstance(content, str):
+            content = content.encode()
+        file_path = os.path.join(self.path, key)
+        os.makedirs(os.path.dirname(file_path), exist_ok=True)
+        with open(file_path, 'wb') as f:
+            f.write(content)
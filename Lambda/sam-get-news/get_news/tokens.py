@@ -0,0 +1,32 @@
+# Rough token count, without loading a tokenizer: English text averages
+# about four characters per token
+
+CHARS_PER_TOKEN = 4
+
+
+def estimate_tokens(text):
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+# Split text into chunks under max_tokens, at line boundaries when possible
+def split_text(text, max_tokens):
+    max_chars = max_tokens * CHARS_PER_TOKEN
+    chunks = []
+    chunk = []
+    size = 0
+    for line in text.splitlines():
+        if size + len(line) + 1 > max_chars and chunk:
+            chunks.append('\n'.join(chunk))
+            chunk = []
+            size = 0
+        while len(line) > max_chars:  # Line too long for a single chunk
+            cut = line.rfind(' ', 0, max_chars)
+            if cut <= 0:
+                cut = max_chars
+            chunks.append(line[:cut])
+            line = line[cut:].lstrip()
+        chunk.append(line)
+        size += len(line) + 1
+    if chunk:
+        chunks.append('\n'.join(chunk))
+    return chunks
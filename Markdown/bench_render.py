@@ -0,0 +1,54 @@
+# Compare writing Markdown, HTML, and Word in process with the pandoc
+# conversions of run.sh, on a synthetic edition of the news
+#
+#   python bench_render.py --entries 1000
+
+import os
+import time
+import argparse
+import tempfile
+
+from markdown_news import write_news
+
+
+def make_news(entries, summary_size):
+    return {
+        'title': 'Synthetic news',
+        'entries': [{
+            'title': 'Entry {} & more'.format(n),
+            'link': 'https://example.com/news/{}?a=1&b=2'.format(n),
+            'summary': 'Summary text. ' * (summary_size // 14)
+        } for n in range(entries)]
+    }
+
+
+def measure(function, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        function()
+    return (time.perf_counter() - start) / repeat
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the news renderers')
+    parser.add_argument('--entries', type=int, default=1000)
+    parser.add_argument('--summary-size', type=int, default=240)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    news = make_news(args.entries, args.summary_size)
+    with tempfile.TemporaryDirectory() as tmp:
+        outputs = [os.path.join(tmp, 'news.' + ext) for ext in ('md', 'html', 'docx')]
+        print('{} entries'.format(args.entries))
+        for name, use_pandoc in [('in-process', False), ('pandoc', True)]:
+            try:
+                elapsed = measure(lambda: write_news(news, outputs, use_pandoc), args.repeat)
+            except ValueError as e:
+                print('{:>12}: skipped, {}'.format(name, e))
+                continue
+            sizes = ', '.join('{} {:.0f} KiB'.format(f.rsplit('.', 1)[-1], os.path.getsize(f) / 1024) for f in outputs)
+            print('{:>12}: {:8.3f} s ({})'.format(name, elapsed, sizes))
+
+
+if __name__ == '__main__':
+    main()
@@ -1,5 +1,14 @@
 import urllib.request
 import json
+import sys
+import io
+import html
+import shutil
+import argparse
+import subprocess
+import zipfile
+from xml.sax.saxutils import escape, quoteattr
+from news_archive import NewsArchive
 
 NEWS_URL = 'https://BUCKER-NAME.s3.REGION.amazonaws.com/news.json'
 
@@ -8,11 +17,202 @@ def download_news(news_url):
     return urllib.request.urlopen(news_url).read()
 
 def print_news(news):
-    print("# {}\n".format(news['title']))
-    for n in news:
-        print("## [{}]({})\n".format(n['title'], n['link']))
-        print("{}\n".format(n['summary']))
+    render_news(news, [MarkdownWriter(sys.stdout)])
+
+
+# Writers for each output format, fed one entry at a time, so that all the
+# formats are written in a single pass over the news
+
+class MarkdownWriter:
+    def __init__(self, out):
+        self.out = out
+
+    def begin(self, title):
+        self.out.write("# {}\n\n".format(title))
+
+    def entry(self, n):
+        self.out.write("## [{}]({})\n\n".format(n['title'], n['link']))
+        self.out.write("{}\n\n".format(n['summary']))
+
+    def end(self):
+        pass
+
+
+class HTMLWriter:
+    def __init__(self, out):
+        self.out = out
+
+    def begin(self, title):
+        self.out.write('<!DOCTYPE html>\n<html>\n<head>\n<meta charset="utf-8">\n')
+        self.out.write('<title>{}</title>\n</head>\n<body>\n'.format(html.escape(title)))
+        self.out.write('<h1>{}</h1>\n'.format(html.escape(title)))
+
+    def entry(self, n):
+        self.out.write('<h2><a href="{}">{}</a></h2>\n'.format(html.escape(n['link']), html.escape(n['title'])))
+        self.out.write('<p>{}</p>\n'.format(html.escape(n['summary'])))
+
+    def end(self):
+        self.out.write('</body>\n</html>\n')
+
+
+# A minimal Word document: a zip with the document XML, the styles of the
+# headings, and the relationships for the links
+
+DOCX_CONTENT_TYPES = '''<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">
+<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>
+<Default Extension="xml" ContentType="application/xml"/>
+<Override PartName="/word/document.xml" ContentType="application/vnd.openxmlformats-officedocument.wordprocessingml.document.main+xml"/>
+<Override PartName="/word/styles.xml" ContentType="application/vnd.openxmlformats-officedocument.wordprocessingml.styles+xml"/>
+</Types>'''
+
+DOCX_RELS = '''<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">
+<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" Target="word/document.xml"/>
+</Relationships>'''
+
+DOCX_STYLES = '''<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<w:styles xmlns:w="http://schemas.openxmlformats.org/wordprocessingml/2006/main">
+<w:style w:type="paragraph" w:default="1" w:styleId="Normal"><w:name w:val="Normal"/><w:pPr><w:spacing w:after="160"/></w:pPr></w:style>
+<w:style w:type="paragraph" w:styleId="Heading1"><w:name w:val="heading 1"/><w:basedOn w:val="Normal"/><w:pPr><w:outlineLvl w:val="0"/></w:pPr><w:rPr><w:b/><w:sz w:val="36"/></w:rPr></w:style>
+<w:style w:type="paragraph" w:styleId="Heading2"><w:name w:val="heading 2"/><w:basedOn w:val="Normal"/><w:pPr><w:outlineLvl w:val="1"/></w:pPr><w:rPr><w:b/><w:sz w:val="28"/></w:rPr></w:style>
+<w:style w:type="character" w:styleId="Hyperlink"><w:name w:val="Hyperlink"/><w:rPr><w:color w:val="0563C1"/><w:u w:val="single"/></w:rPr></w:style>
+</w:styles>'''
+
+W_NAMESPACES = ('xmlns:w="http://schemas.openxmlformats.org/wordprocessingml/2006/main" '
+                'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships"')
+HYPERLINK = 'http://schemas.openxmlformats.org/officeDocument/2006/relationships/hyperlink'
+STYLES = 'http://schemas.openxmlformats.org/officeDocument/2006/relationships/styles'
+
+
+class DocxWriter:
+    def __init__(self, out):
+        self.zip = zipfile.ZipFile(out, 'w', zipfile.ZIP_DEFLATED)
+        self.document = None
+        self.links = []
+
+    def write(self, text):
+        self.document.write(text.encode('utf-8'))
+
+    def paragraph(self, text, style=None):
+        self.write('<w:p>')
+        if style:
+            self.write('<w:pPr><w:pStyle w:val="{}"/></w:pPr>'.format(style))
+        self.write('<w:r><w:t xml:space="preserve">{}</w:t></w:r></w:p>'.format(escape(text)))
+
+    def begin(self, title):
+        self.zip.writestr('[Content_Types].xml', DOCX_CONTENT_TYPES)
+        self.zip.writestr('_rels/.rels', DOCX_RELS)
+        self.zip.writestr('word/styles.xml', DOCX_STYLES)
+        self.document = self.zip.open('word/document.xml', 'w')
+        self.write('<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n')
+        self.write('<w:document {}><w:body>'.format(W_NAMESPACES))
+        self.paragraph(title, 'Heading1')
+
+    def entry(self, n):
+        self.links.append(n['link'])
+        self.write('<w:p><w:pPr><w:pStyle w:val="Heading2"/></w:pPr>')
+        self.write('<w:hyperlink r:id="rLink{}"><w:r><w:rPr><w:rStyle w:val="Hyperlink"/></w:rPr>'.format(len(self.links)))
+        self.write('<w:t xml:space="preserve">{}</w:t></w:r></w:hyperlink></w:p>'.format(escape(n['title'])))
+        self.paragraph(n['summary'])
+
+    def end(self):
+        self.write('</w:body></w:document>')
+        self.document.close()
+        rels = ['<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+                '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">',
+                '<Relationship Id="rStyles" Type="{}" Target="styles.xml"/>'.format(STYLES)]
+        for i, link in enumerate(self.links, 1):
+            rels.append('<Relationship Id="rLink{}" Type="{}" Target={} TargetMode="External"/>'.format(
+                i, HYPERLINK, quoteattr(link)))
+        rels.append('</Relationships>')
+        self.zip.writestr('word/_rels/document.xml.rels', ''.join(rels))
+        self.zip.close()
+
+
+def render_news(news, writers):
+    for w in writers:
+        w.begin(news['title'])
+    for n in news['entries']:
+        for w in writers:
+            w.entry(n)
+    for w in writers:
+        w.end()
+
+
+WRITERS = {'md': MarkdownWriter, 'html': HTMLWriter, 'docx': DocxWriter}
+
+
+def get_format(file_name):
+    return file_name.rsplit('.', 1)[-1].lower()
+
+
+# Write the news in the formats of the output files, in process, or with
+# pandoc from the Markdown output (pandoc is also needed for PDF)
+def write_news(news, file_names, use_pandoc=False):
+    files = []
+    writers = []
+    pandoc_outputs = []
+    try:
+        for file_name in file_names:
+            file_format = get_format(file_name)
+            if file_format == 'md' or (file_format in WRITERS and not use_pandoc):
+                is_text = file_format != 'docx'
+                f = open(file_name, 'w', encoding='utf-8') if is_text else open(file_name, 'wb')
+                files.append(f)
+                writers.append(WRITERS[file_format](f))
+            elif shutil.which('pandoc'):
+                pandoc_outputs.append(file_name)
+            else:
+                raise ValueError('{}: install pandoc for this format'.format(file_name))
+        render_news(news, writers)
+    finally:
+        for f in files:
+            f.close()
+
+    if pandoc_outputs:
+        source = render_markdown(news)
+        for file_name in pandoc_outputs:
+            subprocess.run(['pandoc', '-f', 'markdown', '-o', file_name], input=source.encode('utf-8'), check=True)
+
+
+def render_markdown(news):
+    out = io.StringIO()
+    render_news(news, [MarkdownWriter(out)])
+    return out.getvalue()
+
 
 if __name__=='__main__':
-    news = json.loads(download_news(NEWS_URL))
-    print_news(news)
\ No newline at end of file
+    parser = argparse.ArgumentParser(description='Write the news as Markdown, HTML, or Word documents')
+    parser.add_argument('-o', '--output', action='append', default=[],
+                        help='output file, the format is from the extension: md, html, docx (pdf with pandoc)')
+    parser.add_argument('--pandoc', action='store_true', help='convert the Markdown with pandoc')
+    parser.add_argument('--url', default=NEWS_URL)
+    parser.add_argument('--archive', help='directory of the local archive, synced with the news')
+    parser.add_argument('--offline', action='store_true', help='use the archive without downloading')
+    parser.add_argument('--since-last-read', action='store_true', help='digest of the news not read yet')
+    parser.add_argument('--since', help='digest of the news from this date (YYYY-MM-DD)')
+    parser.add_argument('--until', help='digest of the news up to this date (YYYY-MM-DD)')
+    args = parser.parse_args()
+
+    if args.archive:
+        archive = NewsArchive(args.archive)
+        if not args.offline:
+            archive.sync(args.url)
+        if args.since_last_read:
+            news = archive.digest(archive.index['last_read'], args.until)
+        elif args.since or args.until:
+            news = archive.digest(args.since, args.until)
+        else:
+            news = archive.latest()
+        if news is None:
+            parser.exit(1, 'The archive is empty\n')
+    else:
+        news = json.loads(download_news(args.url))
+    if args.output:
+        write_news(news, args.output, args.pandoc)
+    else:
+        print_news(news)
+    # Only when the digest was written, so that a failure shows it again
+    if args.archive and args.since_last_read:
+        archive.mark_read(args.until)
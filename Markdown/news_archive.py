@@ -0,0 +1,117 @@
+import os
+import json
+import gzip
+import hashlib
+import urllib.request
+import urllib.error
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+
+# Local archive of the news: each distinct edition is stored once, compressed
+# and named by the hash of its content, and the index has the editions by
+# date and, for each link, the date and edition where it was first seen.
+#
+#   archive/index.json
+#   archive/editions/<sha256>.json.gz
+
+
+def now():
+    return datetime.now(timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ')
+
+
+def http_date_to_iso(value):
+    return parsedate_to_datetime(value).astimezone(timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ')
+
+
+class NewsArchive:
+    def __init__(self, path):
+        self.path = path
+        self.index_file = os.path.join(path, 'index.json')
+        os.makedirs(os.path.join(path, 'editions'), exist_ok=True)
+        try:
+            with open(self.index_file) as f:
+                self.index = json.load(f)
+        except FileNotFoundError:
+            self.index = {'etag': None, 'last_modified': None, 'last_read': None, 'editions': [], 'links': {}}
+
+    def save(self):
+        tmp_file = self.index_file + '.tmp'
+        with open(tmp_file, 'w') as f:
+            json.dump(self.index, f)
+        os.replace(tmp_file, self.index_file)
+
+    def edition_file(self, digest):
+        return os.path.join(self.path, 'editions', digest + '.json.gz')
+
+    # Download the news only if it changed since the last sync, returns True
+    # when there is a new edition
+    def sync(self, news_url):
+        request = urllib.request.Request(news_url)
+        if self.index['etag']:
+            request.add_header('If-None-Match', self.index['etag'])
+        if self.index['last_modified']:
+            request.add_header('If-Modified-Since', self.index['last_modified'])
+        try:
+            with urllib.request.urlopen(request) as response:
+                body = response.read()
+                etag = response.headers.get('ETag')
+                last_modified = response.headers.get('Last-Modified')
+        except urllib.error.HTTPError as e:
+            if e.code == 304:
+                return False
+            raise
+        self.index['etag'] = etag
+        self.index['last_modified'] = last_modified
+        date = http_date_to_iso(last_modified) if last_modified else now()
+        added = self.add_edition(body, date)
+        self.save()
+        return added
+
+    def add_edition(self, body, date):
+        digest = hashlib.sha256(body).hexdigest()
+        if any(e['hash'] == digest for e in self.index['editions']):
+            return False
+        news = json.loads(body)
+        with gzip.open(self.edition_file(digest), 'wb') as f:
+            f.write(body)
+        self.index['editions'].append({'hash': digest, 'date': date, 'title': news['title']})
+        self.index['editions'].sort(key=lambda e: e['date'])
+        for n in news['entries']:
+            seen = self.index['links'].get(n['link'])
+            if seen is None or date < seen['date']:
+                self.index['links'][n['link']] = {'date': date, 'edition': digest}
+        return True
+
+    def load_edition(self, digest):
+        with gzip.open(self.edition_file(digest), 'rb') as f:
+            return json.loads(f.read())
+
+    def latest(self):
+        if not self.index['editions']:
+            return None
+        return self.load_edition(self.index['editions'][-1]['hash'])
+
+    # News with the entries first seen after since and up to until (dates or
+    # prefixes of dates, like 2024-05-01), oldest first
+    def digest(self, since=None, until=None):
+        links = [
+            (seen['date'], link, seen['edition']) for link, seen in self.index['links'].items()
+            if (since is None or seen['date'] > since) and (until is None or seen['date'][:len(until)] <= until)
+        ]
+        links.sort()
+        editions = {}
+        entries = []
+        for date, link, digest in links:
+            if digest not in editions:
+                editions[digest] = {n['link']: n for n in self.load_edition(digest)['entries']}
+            entries.append(editions[digest][link])
+        titles = sorted({e['title'] for e in self.index['editions'] if e['hash'] in editions})
+        return {'title': ', '.join(titles) or 'No news', 'entries': entries}
+
+    # Entries up to the newest edition in the archive (or up to until) have
+    # been read
+    def mark_read(self, until=None):
+        dates = [e['date'] for e in self.index['editions'] if until is None or e['date'][:len(until)] <= until]
+        if dates:
+            self.index['last_read'] = max(dates)
+            self.save()
@@ -1,4 +1,2 @@
-python markdown_news.py > news.md
-pandoc news.md -o news.html
-pandoc news.md -o news.docx
-#pandoc news.md -o news.pdf
\ No newline at end of file
+python markdown_news.py -o news.md -o news.html -o news.docx
+#python markdown_news.py --pandoc -o news.pdf
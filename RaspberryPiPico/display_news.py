@@ -9,14 +9,21 @@ import urequests as requests
 from time import sleep
 from picozero import pico_temp_sensor, pico_led
 from micropython import const
-import machine
 
 import json
+import struct
+import _thread
 
 
 # Parameters to update
 
 NEWS_URL = 'https://BUCKER-NAME.s3.REGION.amazonaws.com/news.json'
+PROFILE = 'epd_2in13_landscape'  # Pages rendered by the Lambda function, see OUTPUT_PROFILES
+PAGES_URL = ''  # Or the news.pages file rasterized by the Lambda function, see OUTPUT_RASTER
+NEWS_BIN_URL = ''  # Or the compact news.bin file, decoded one entry at a time, see OUTPUT_BINARY
+FULL_REFRESH_EVERY = 10  # Partial refreshes before a full one, to remove the ghosting
+POLL_INTERVAL = 0  # Seconds between downloads of the news, 0 to check at every loop
+RADIO_POWERSAVE = False  # Let the Wi-Fi radio sleep between downloads, staying connected
 SSID = const('WIFI-NETWORK-NAME')
 PASSWORD = const('WIFI-NETWORK-PASSWORD')
 
@@ -174,9 +181,11 @@ class EPD_2in13_V3_Portrait(framebuf.FrameBuffer):
         self.digital_write(self.cs_pin, 1)
 
     def send_data1(self, buf):
+        if isinstance(buf, list):
+            buf = bytearray(buf)
         self.digital_write(self.dc_pin, 1)
         self.digital_write(self.cs_pin, 0)
-        self.spi.write(bytearray(buf))
+        self.spi.write(buf)
         self.digital_write(self.cs_pin, 1)
 
     '''
@@ -323,7 +332,7 @@ class EPD_2in13_V3_Portrait(framebuf.FrameBuffer):
 
     def Clear(self):
         self.send_command(0x24)
-        self.send_data1([0xff] * self.height * int(self.width / 8))
+        self.send_data1(b'\xff' * (self.height * self.width // 8))
 
         self.TurnOnDisplay()
 
@@ -408,7 +417,7 @@ class EPD_2in13_V3_Portrait(framebuf.FrameBuffer):
 
 
 class EPD_2in13_V3_Landscape(framebuf.FrameBuffer):
-    def __init__(self):
+    def __init__(self, full_refresh_every=10):
         self.reset_pin = Pin(RST_PIN, Pin.OUT)
 
         self.busy_pin = Pin(BUSY_PIN, Pin.IN, Pin.PULL_UP)
@@ -428,6 +437,10 @@ class EPD_2in13_V3_Landscape(framebuf.FrameBuffer):
         self.dc_pin = Pin(DC_PIN, Pin.OUT)
 
         self.buffer = bytearray(self.height * self.width // 8)
+        self.panel_buffer = bytearray(len(self.buffer))  # The buffer in the order of the panel RAM
+        self.shown_buffer = bytearray(len(self.buffer))  # What display_Changes last showed
+        self.full_refresh_every = full_refresh_every
+        self.partials = full_refresh_every  # Start with a full refresh
         super().__init__(self.buffer, self.height, self.width, framebuf.MONO_VLSB)
         self.init()
 
@@ -464,9 +477,11 @@ class EPD_2in13_V3_Landscape(framebuf.FrameBuffer):
         self.digital_write(self.cs_pin, 1)
 
     def send_data1(self, buf):
+        if isinstance(buf, list):
+            buf = bytearray(buf)
         self.digital_write(self.dc_pin, 1)
         self.digital_write(self.cs_pin, 0)
-        self.spi.write(bytearray(buf))
+        self.spi.write(buf)
         self.digital_write(self.cs_pin, 1)
 
     def ReadBusy(self):
@@ -527,6 +542,7 @@ class EPD_2in13_V3_Landscape(framebuf.FrameBuffer):
 
     def init(self):
         print('init')
+        self.partial_lut_loaded = False
         self.reset()
         self.delay_ms(100)
 
@@ -560,32 +576,40 @@ class EPD_2in13_V3_Landscape(framebuf.FrameBuffer):
 
     def Clear(self):
         self.send_command(0x24)
-        self.send_data1([0xff] * self.height * int(self.width / 8))
+        self.send_data1(b'\xff' * (self.height * self.width // 8))
 
         self.TurnOnDisplay()
 
+    # The panel RAM takes the rows of 8 pixels of the VLSB buffer from the
+    # bottom to the top: copy them once in that order, so that the image is
+    # sent with a single SPI write
+    def rotate(self, image):
+        src = memoryview(image)
+        dst = memoryview(self.panel_buffer)
+        rows = self.width // 8
+        for j in range(rows):
+            k = rows - 1 - j
+            dst[j * self.height:(j + 1) * self.height] = src[k * self.height:(k + 1) * self.height]
+        return self.panel_buffer
+
     def display(self, image):
         self.send_command(0x24)
-        for j in range(int(self.width / 8) - 1, -1, -1):
-            for i in range(0, self.height):
-                self.send_data(image[i + j * self.height])
+        self.send_data1(self.rotate(image))
 
         self.TurnOnDisplay()
 
     def Display_Base(self, image):
+        panel_image = self.rotate(image)
         self.send_command(0x24)
-        for j in range(int(self.width / 8) - 1, -1, -1):
-            for i in range(0, self.height):
-                self.send_data(image[i + j * self.height])
+        self.send_data1(panel_image)
 
         self.send_command(0x26)
-        for j in range(int(self.width / 8) - 1, -1, -1):
-            for i in range(0, self.height):
-                self.send_data(image[i + j * self.height])
+        self.send_data1(panel_image)
 
         self.TurnOnDisplay()
 
-    def display_Partial(self, image):
+    def partial_mode(self):
+        self.partial_lut_loaded = True
         self.digital_write(self.reset_pin, 0)
         self.delay_ms(1)
         self.digital_write(self.reset_pin, 1)
@@ -613,16 +637,80 @@ class EPD_2in13_V3_Landscape(framebuf.FrameBuffer):
         self.send_command(0x20)
         self.ReadBusy()
 
+    def display_Partial(self, image):
+        self.partial_mode()
+
         self.SetWindows(0, 0, self.width-1, self.height-1)
         self.SetCursor(0, 0)
 
         self.send_command(0x24)
-        for j in range(int(self.width / 8) - 1, -1, -1):
-            for i in range(0, self.height):
-                self.send_data(image[i + j * self.height])
+        self.send_data1(self.rotate(image))
 
         self.TurnOnDisplayPart()
 
+    # Partial refresh of the columns x0 to x1 and the rows of 8 pixels j0 to
+    # j1 of the buffer: in the panel RAM, rows are X addresses from the bottom
+    # and columns are Y addresses
+    def display_Window(self, image, x0, x1, j0, j1):
+        self.partial_mode()
+
+        rows = self.width // 8
+        self.SetWindows((rows - 1 - j1) * 8, x0, (rows - 1 - j0) * 8 + 7, x1)
+        self.SetCursor(rows - 1 - j1, x0)
+
+        src = memoryview(image)
+        dst = memoryview(self.panel_buffer)
+        size = x1 - x0 + 1
+        n = 0
+        for j in range(j1, j0 - 1, -1):
+            start = j * self.height + x0
+            dst[n:n + size] = src[start:start + size]
+            n += size
+        self.send_command(0x24)
+        self.send_data1(dst[:n])
+
+        self.TurnOnDisplayPart()
+
+        self.SetWindows(0, 0, self.width-1, self.height-1)
+        self.SetCursor(0, 0)
+
+    # Bounding box (x0, x1, j0, j1) of the bytes that differ from the image
+    # last shown, None when nothing changed
+    def changed_box(self, image):
+        shown = self.shown_buffer
+        h = self.height
+        rows = [j for j in range(self.width // 8) if image[j * h:(j + 1) * h] != shown[j * h:(j + 1) * h]]
+        if not rows:
+            return None
+        x0, x1 = h - 1, 0
+        for j in rows:
+            start = j * h
+            i = 0
+            while i < x0 and image[start + i] == shown[start + i]:
+                i += 1
+            x0 = i
+            i = h - 1
+            while i > x1 and image[start + i] == shown[start + i]:
+                i -= 1
+            x1 = i
+        return x0, x1, rows[0], rows[-1]
+
+    # Refresh only the part of the display that changed, with a full refresh
+    # every full_refresh_every partial ones
+    def display_Changes(self, image):
+        if self.partials >= self.full_refresh_every:
+            if self.partial_lut_loaded:
+                self.init()  # Back to the full refresh waveform
+            self.Display_Base(image)
+            self.partials = 0
+        else:
+            box = self.changed_box(image)
+            if box is None:
+                return
+            self.display_Window(image, *box)
+            self.partials += 1
+        self.shown_buffer[:] = image
+
     def sleep(self):
         self.send_command(0x10)  # enter deep sleep
         self.send_data(0x01)
@@ -631,10 +719,19 @@ class EPD_2in13_V3_Landscape(framebuf.FrameBuffer):
 
 # Connect the Raspberri Pi Pico W to a Wi-Fi network
 
+wlan = None
+
+
 def connect(ssid, password):
+    global wlan
+    # Reuse the connection until it drops
+    if wlan is not None and wlan.isconnected():
+        return wlan.ifconfig()[0]
     # Connect to WLAN
     wlan = network.WLAN(network.STA_IF)
     wlan.active(True)
+    if RADIO_POWERSAVE:
+        wlan.config(pm=network.WLAN.PM_POWERSAVE)
     wlan.connect(ssid, password)
     while wlan.isconnected() == False:
         print('Waiting for connection...')
@@ -645,17 +742,174 @@ def connect(ssid, password):
     return ip
 
 
-# Download the news into a Python dictionary
+# Download the news into a Python dictionary. The news is kept with its ETag:
+# when the file has not changed, the server answers 304 and the news already
+# decoded is used again
+
+last_news = None
+last_etag = None
+last_download = 0
+
+
+def get_header(res, name):
+    for key, value in res.headers.items():
+        if key.lower() == name.lower():
+            return value
+    return None
+
 
 def get_news():
+    global last_news, last_etag, last_download
     print('get_news')
+    if last_news is not None and time.time() - last_download < POLL_INTERVAL:
+        return last_news
+    ip = connect(SSID, PASSWORD)
+    headers = {}
+    if last_news is not None and last_etag:
+        headers['If-None-Match'] = last_etag
+    res = requests.get(NEWS_URL, headers=headers)
     try:
-        ip = connect(SSID, PASSWORD)
-        res = requests.get(NEWS_URL)
-        news = json.loads(res.text)
-        return news
-    except (KeyboardInterrupt, ValueError):
-        machine.reset()
+        if res.status_code == 304:
+            print('News not modified')
+        else:
+            last_news = json.loads(res.text)
+            last_etag = get_header(res, 'ETag')
+    finally:
+        res.close()
+    last_download = time.time()
+    return last_news
+
+
+# The next news is downloaded on the second core while the display shows the
+# current one, and handed over in a slot protected by a lock. The display
+# asks for a new download at the start of each loop, and a failed download
+# is retried later, keeping the news already on the display
+
+RETRY_INTERVAL = const(30)  # Seconds
+PREFETCH_STACK_SIZE = const(16 * 1024)  # The TLS handshake needs more than the default stack
+
+news_lock = _thread.allocate_lock()
+news_slot = None
+news_wanted = True
+news_stop = False
+
+
+def prefetch_news():
+    global news_slot, news_wanted
+    while True:
+        with news_lock:
+            if news_stop:
+                return
+            wanted = news_wanted
+            news_wanted = False
+        if not wanted:
+            time.sleep(0.1)
+            continue
+        try:
+            news = get_news()
+        except Exception as e:
+            print('Download failed:', e)
+            with news_lock:
+                news_wanted = True
+            time.sleep(RETRY_INTERVAL)
+            continue
+        with news_lock:
+            news_slot = news
+
+
+# The most recent news, waiting only for the first download
+def take_news():
+    global news_wanted
+    while True:
+        with news_lock:
+            news = news_slot
+            news_wanted = True
+        if news is not None:
+            return news
+        time.sleep(0.1)
+
+
+def stop_prefetch():
+    global news_stop
+    with news_lock:
+        news_stop = True
+
+
+# Fill a buffer (or a memoryview of it) from a stream
+
+def read_into(stream, buf):
+    mv = memoryview(buf)
+    n = 0
+    while n < len(mv):
+        read = stream.readinto(mv[n:])
+        if not read:
+            raise ValueError('Incomplete response')
+        n += read
+
+
+# Read the rasterized pages from a single response, one at a time, straight
+# into the frame buffer of the display. The header of the pages file has the
+# magic, the number of pages, and the bytes in each page
+
+PAGES_MAGIC = b'EPDP'
+PAGES_HEADER_SIZE = const(8)
+
+
+def stream_pages():
+    res = requests.get(PAGES_URL)
+    try:
+        if res.status_code != 200:
+            raise ValueError('Unexpected status %d' % res.status_code)
+        header = bytearray(PAGES_HEADER_SIZE)
+        read_into(res.raw, header)
+        magic, count, page_size = struct.unpack('>4sHH', header)
+        if magic != PAGES_MAGIC or page_size != len(epd.buffer):
+            raise ValueError('Pages not for this display')
+        for _ in range(count):
+            read_into(res.raw, epd.buffer)
+            yield
+    finally:
+        res.close()
+
+
+# Decode the compact news one field at a time: each field has a 16-bit length
+# and is read into the same buffer, so memory doesn't grow with the number of
+# entries. The whole file is usually smaller than the TCP receive window, so
+# the server is done sending while the pages are shown.
+
+NEWS_MAGIC = b'NWS1'
+MAX_FIELD = const(1024)  # MAX_FIELD_BYTES in the Lambda function
+
+field_buffer = bytearray(MAX_FIELD)
+field_view = memoryview(field_buffer)
+
+
+def read_field(stream):
+    read_into(stream, field_view[:2])
+    size = field_buffer[0] << 8 | field_buffer[1]
+    if size > MAX_FIELD:
+        raise ValueError('Field too long')
+    read_into(stream, field_view[:size])
+    return field_view[:size]
+
+
+# The title of the news, then the summary of each entry
+def stream_news():
+    res = requests.get(NEWS_BIN_URL)
+    try:
+        if res.status_code != 200:
+            raise ValueError('Unexpected status %d' % res.status_code)
+        read_into(res.raw, field_view[:6])
+        if bytes(field_view[:4]) != NEWS_MAGIC:
+            raise ValueError('Not a news file')
+        count = field_buffer[4] << 8 | field_buffer[5]
+        yield str(read_field(res.raw), 'utf-8')
+        for _ in range(count):
+            read_field(res.raw)  # Title
+            read_field(res.raw)  # Link
+            yield str(read_field(res.raw), 'utf-8')
+    finally:
+        res.close()
 
 
 # Display size (landscape mode)
@@ -680,32 +934,122 @@ def wrap_text(text):
             wrapped_text += word
         lines.append(wrapped_text)
     lines = [' ' * int((MAX_WIDTH - len(l))/2) + l for l in lines]
-    for _ in range((MAX_HEIGHT - len(lines) - 1)/2):
+    for _ in range((MAX_HEIGHT - len(lines) - 1) // 2):
         lines.insert(0, '')
     return lines
 
 
+# Lines to draw for each page, already wrapped by the Lambda function when
+# the news has pages for this display. The pages are computed once for each
+# news downloaded, and reused until the news changes
+
+pages_news = None
+pages_cache = None
+
+
+def get_pages(news):
+    global pages_news, pages_cache
+    if news is pages_news:
+        return pages_cache
+    pages = news.get('pages', {}).get(PROFILE)
+    if pages is None:
+        title = news['title']
+        news_list = [title] + [e['summary'] for e in news['entries']]
+        pages = [wrap_text(n) for n in news_list]
+    pages_news, pages_cache = news, pages
+    return pages
+
+
+# Two canvases with their buffers: the next page is drawn in one while the
+# other is on the display
+
+def make_canvases():
+    back_buffer = bytearray(len(epd.buffer))
+    back = framebuf.FrameBuffer(back_buffer, epd.height, epd.width, framebuf.MONO_VLSB)
+    return [(epd, epd.buffer), (back, back_buffer)]
+
+
+def draw_lines(canvas, lines):
+    canvas.fill(0xff)
+    y = 0
+    for line in lines:
+        y += 10
+        canvas.text(line, 0, y, 0x00)
+
+
 # Show the news on the display
 
 def display_news(news):
     print('display_news')
     print(news)
-    title = news['title']
-    news_list = [title] + [e['summary'] for e in news['entries']]
-    for n in news_list:
-        epd.Clear()
-        epd.fill(0xff)
-        epd.display_Partial(epd.buffer)
-        lines = wrap_text(n)
-        y = 0
-        for line in lines:
-            y += 10
-            epd.text(line, 0, y, 0x00)
-        epd.display_Partial(epd.buffer)
-        for _ in range(10):
-            if rp2.bootsel_button() != 0: # Exit if the use presses the button on the Raspberry Pi Pico
+    pages = get_pages(news)
+    if not pages:
+        return True
+    draw_lines(canvases[0][0], pages[0])
+    for n in range(len(pages)):
+        shown = time.ticks_ms()
+        epd.display_Changes(canvases[n % 2][1])
+        if n + 1 < len(pages):
+            draw_lines(canvases[(n + 1) % 2][0], pages[n + 1])
+        if wait_page(shown) == False:
+            return False
+    return True
+
+
+def display_lines(lines):
+    draw_lines(epd, lines)
+    shown = time.ticks_ms()
+    epd.display_Changes(epd.buffer)
+    return wait_page(shown)
+
+
+# Show the compact news while it is decoded, one entry at a time
+
+def display_stream():
+    print('display_stream')
+    try:
+        ip = connect(SSID, PASSWORD)
+        for text in stream_news():
+            if display_lines(wrap_text(text)) == False:
+                return False
+    except (OSError, ValueError) as e:
+        return wait_retry(e)
+    return True
+
+
+# Show the rasterized pages, read one at a time into the frame buffer
+
+def display_pages():
+    print('display_pages')
+    try:
+        ip = connect(SSID, PASSWORD)
+        for _ in stream_pages():
+            shown = time.ticks_ms()
+            epd.display_Changes(epd.buffer)
+            if wait_page(shown) == False:
                 return False
-            time.sleep(1)
+    except (OSError, ValueError) as e:
+        return wait_retry(e)
+    return True
+
+
+# A failed download keeps the last page on the display, and is retried later
+
+def wait_retry(e):
+    print('Download failed:', e)
+    return wait_page(time.ticks_ms(), RETRY_INTERVAL * 1000)
+
+
+# Keep the page on the display for PAGE_TIME milliseconds from when it was shown
+
+PAGE_TIME = const(10000)
+
+
+def wait_page(shown, duration=PAGE_TIME):
+    while time.ticks_diff(time.ticks_ms(), shown) < duration:
+        if rp2.bootsel_button() != 0: # Exit if the use presses the button on the Raspberry Pi Pico
+            return False
+        time.sleep(0.1)
     return True
 
 
@@ -713,15 +1057,26 @@ def display_news(news):
 
 if __name__ == '__main__':
 
-    epd = EPD_2in13_V3_Landscape()
+    epd = EPD_2in13_V3_Landscape(FULL_REFRESH_EVERY)
     epd.Clear()
     epd.fill(0xff)
+    canvases = make_canvases()
+
+    if not PAGES_URL and not NEWS_BIN_URL:
+        _thread.stack_size(PREFETCH_STACK_SIZE)
+        _thread.start_new_thread(prefetch_news, ())
 
     while True:
-        news = get_news()
-        if display_news(news) == False:
+        if PAGES_URL:
+            shown = display_pages()
+        elif NEWS_BIN_URL:
+            shown = display_stream()
+        else:
+            shown = display_news(take_news())
+        if shown == False:
             break
 
+    stop_prefetch()
     epd.init()
     epd.Clear()
     epd.delay_ms(2000)